@@ -0,0 +1,340 @@
+"""
+DeepRL backend benchmarks.
+
+    python bench.py db [--ops N] [--threads N] [--weight-bytes N]
+    python bench.py load [--workers N] [--rounds N] [--saves N] [--hidden-layers 64,64]
+
+`db` compares the old connect-per-request SQLite access pattern against the
+pooled per-thread WAL connections used by server.py. `load` starts server.py
+against a temp DB and drives it with simulated DQN workers; server settings
+(WORKERS, WRITE_BEHIND_SECONDS, ...) are taken from the environment as usual.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import sqlite3
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote
+
+import server
+from blobstore import store_blob_bytes
+
+SAVE_SQL = """
+    INSERT INTO rl_models (
+        model_key, model_json, weight_specs, weight_hash,
+        training_config, metadata, updated_at
+    )
+    VALUES (?, ?, ?, ?, NULL, NULL, ?)
+    ON CONFLICT(model_key) DO UPDATE SET
+        weight_hash=excluded.weight_hash,
+        updated_at=excluded.updated_at
+"""
+LOAD_SQL = """
+    SELECT m.model_json, m.weight_specs, b.data
+    FROM rl_models AS m LEFT JOIN rl_weight_blobs AS b ON b.hash = m.weight_hash
+    WHERE m.model_key = ?
+"""
+
+
+def fresh_connection():
+    # The pre-pool pattern: a new connection (rollback journal, FULL sync) per request.
+    return sqlite3.connect(server.DB_PATH)
+
+
+def pooled_connection():
+    return server.get_conn()
+
+
+def run_db_ops(connect, ops, threads, weight_bytes, close=False, keys=16):
+    weights = os.urandom(weight_bytes)
+
+    def op(index):
+        key = f"bench-{index % keys}"
+        conn = connect()
+        with conn:
+            if index % 2 == 0:
+                now = datetime.utcnow().isoformat() + "Z"
+                digest = store_blob_bytes(conn, weights)
+                conn.execute(SAVE_SQL, (key, "{}", "[]", digest, now))
+            else:
+                conn.execute(LOAD_SQL, (key,)).fetchone()
+        if close:
+            conn.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(op, range(ops)))
+    return time.perf_counter() - start
+
+
+def use_temp_db(directory, name, journal_mode):
+    server.DB_PATH = os.path.join(directory, name)
+    server.init_db()
+    conn = sqlite3.connect(server.DB_PATH)
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    conn.close()
+
+
+def bench_db(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        use_temp_db(directory, "fresh.db", "DELETE")
+        results["connect-per-request"] = run_db_ops(
+            fresh_connection, args.ops, args.threads, args.weight_bytes, close=True
+        )
+        use_temp_db(directory, "pooled.db", "WAL")
+        results["pooled WAL"] = run_db_ops(
+            pooled_connection, args.ops, args.threads, args.weight_bytes
+        )
+        server.close_connections()
+
+    print(f"{args.ops} ops ({args.threads} threads, {args.weight_bytes} byte weights, 50% writes)")
+    baseline = results["connect-per-request"]
+    for name, duration in results.items():
+        print(
+            f"  {name:<22} {duration * 1000:9.1f}ms  {args.ops / duration:9.1f} ops/s"
+            f"  x{baseline / duration:.2f}"
+        )
+
+
+# DeepRL.buildState yields 18 features plus a 3x3 tile window; RL_CONFIG.actionMap
+# has 10 actions.
+STATE_SIZE = 27
+ACTION_SIZE = 10
+
+
+def dense_weight_specs(hidden_layers):
+    """weightSpecs of the worker's buildModel: float32 Dense kernels and biases"""
+    sizes = [STATE_SIZE] + hidden_layers + [ACTION_SIZE]
+    specs = []
+    for index, (inputs, units) in enumerate(zip(sizes, sizes[1:])):
+        name = f"dense_Dense{index + 1}"
+        specs.append({"name": f"{name}/kernel", "shape": [inputs, units], "dtype": "float32"})
+        specs.append({"name": f"{name}/bias", "shape": [units], "dtype": "float32"})
+    return specs
+
+
+def model_payload(weight_specs, hidden_layers, map_key, step):
+    layers = [
+        {
+            "class_name": "Dense",
+            "config": {"units": units, "activation": "relu", "name": f"dense_Dense{index + 1}"},
+        }
+        for index, units in enumerate(hidden_layers + [ACTION_SIZE])
+    ]
+    return {
+        "modelTopology": {
+            "class_name": "Sequential",
+            "config": {"name": "sequential_1", "layers": layers},
+            "keras_version": "tfjs-layers 4.20.0",
+            "backend": "tensor_flow.js",
+        },
+        "weightSpecs": weight_specs,
+        "trainingConfig": {"loss": "meanSquaredError", "optimizer_config": {"class_name": "Adam"}},
+        "userDefinedMetadata": {"mapKey": map_key, "steps": step},
+    }
+
+
+def weight_patch(weight_specs, weight_data):
+    # Every tensor changes between checkpoints, so the worker patches them all.
+    header = json.dumps(
+        {"tensors": [{"name": spec["name"], "mode": "replace"} for spec in weight_specs]}
+    ).encode("utf-8")
+    return struct.pack("<I", len(header)) + header + weight_data
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((server.HOST, 0))
+        return sock.getsockname()[1]
+
+
+def start_server(db_path, port):
+    env = dict(os.environ, PORT=str(port))
+    process = subprocess.Popen(
+        [
+            sys.executable, "-c",
+            "import server, sys; server.DB_PATH = sys.argv[1]; server.main()", db_path,
+        ],
+        cwd=server.ROOT_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(server.HOST, port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+class LoadWorker:
+    """One simulated DQN worker: allocate, load, save periodically, release"""
+
+    def __init__(self, port, map_key, args, weight_specs, latencies):
+        self.conn = http.client.HTTPConnection(server.HOST, port, timeout=60)
+        self.map_key = map_key
+        self.args = args
+        self.weight_specs = weight_specs
+        self.weight_bytes = sum(
+            length for _, length, _ in server.weight_spec_layout(weight_specs).values()
+        )
+        self.latencies = latencies
+        self.errors = 0
+
+    def request(self, route, method, path, body=None, headers=None):
+        start = time.perf_counter()
+        try:
+            self.conn.request(method, path, body=body, headers=headers or {})
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.errors += 1
+            return None, b""
+        if response.will_close:
+            self.conn.close()
+        if response.status >= 400:
+            # A failed save or load is an error, not a fast request.
+            self.errors += 1
+            return response.status, data
+        self.latencies[route].append(time.perf_counter() - start)
+        return response.status, data
+
+    def run(self):
+        hidden_layers = self.args.hidden_layers
+        for _ in range(self.args.rounds):
+            status, data = self.request(
+                "allocate", "GET",
+                f"/api/rl-allocate/{quote(self.map_key)}?baseKey=bench",
+            )
+            if status != 200:
+                continue
+            allocation = json.loads(data)
+            key = quote(allocation["modelKey"])
+            # Like dqn-worker.js, only load keys that have a saved model.
+            if not allocation["isNew"] or allocation.get("copiedFrom"):
+                status, _ = self.request("model GET", "GET", f"/api/rl-model/{key}?weights=0")
+                if status == 200:
+                    self.request("weights GET", "GET", f"/api/rl-weights/{key}")
+            uploaded = False
+            for step in range(self.args.saves):
+                time.sleep(self.args.save_interval)
+                payload = model_payload(self.weight_specs, hidden_layers, self.map_key, step)
+                self.request(
+                    "model POST", "POST", f"/api/rl-model/{key}", json.dumps(payload),
+                    {"Content-Type": "application/json"},
+                )
+                weight_data = os.urandom(self.weight_bytes)
+                if uploaded:
+                    self.request(
+                        "weights PATCH", "PATCH", f"/api/rl-weights/{key}",
+                        weight_patch(self.weight_specs, weight_data),
+                        {"Content-Type": "application/octet-stream"},
+                    )
+                else:
+                    self.request(
+                        "weights POST", "POST", f"/api/rl-weights/{key}", weight_data,
+                        {"Content-Type": "application/octet-stream"},
+                    )
+                    uploaded = True
+            self.request(
+                "release", "POST", f"/api/rl-release/{quote(self.map_key)}",
+                json.dumps({"modelKey": allocation["modelKey"]}),
+                {"Content-Type": "application/json"},
+            )
+        self.conn.close()
+
+
+def bench_load(args):
+    weight_specs = dense_weight_specs(args.hidden_layers)
+    latencies = defaultdict(list)
+    with tempfile.TemporaryDirectory() as directory:
+        port = free_port()
+        process = start_server(os.path.join(directory, "load.db"), port)
+        try:
+            workers = []
+            for index in range(args.workers):
+                # Per-worker latency lists, merged once the run is over.
+                workers.append(LoadWorker(
+                    port, f"bench-map-{index % args.maps}", args, weight_specs, defaultdict(list)
+                ))
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                list(executor.map(lambda worker: worker.run(), workers))
+            duration = time.perf_counter() - start
+        finally:
+            process.terminate()
+            process.wait()
+    errors = 0
+    for worker in workers:
+        errors += worker.errors
+        for route, values in worker.latencies.items():
+            latencies[route].extend(values)
+
+    print(
+        f"{args.workers} workers x {args.rounds} rounds x {args.saves} saves, "
+        f"hiddenLayers {args.hidden_layers} ({workers[0].weight_bytes} byte weights), "
+        f"{duration:.2f}s, {errors} errors"
+    )
+    print(f"  {'route':<14} {'count':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    total = 0
+    for route, values in sorted(latencies.items()):
+        values.sort()
+        total += len(values)
+        print(
+            f"  {route:<14} {len(values):7d} {len(values) / duration:9.1f}"
+            f" {percentile(values, 0.50) * 1000:9.2f} {percentile(values, 0.95) * 1000:9.2f}"
+            f" {percentile(values, 0.99) * 1000:9.2f}"
+        )
+    print(f"  {'total':<14} {total:7d} {total / duration:9.1f}")
+
+
+def layer_sizes(text):
+    return [int(size) for size in text.split(",") if size]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    db_parser = sub.add_parser("db", help="SQLite connection handling micro-benchmark")
+    db_parser.add_argument("--ops", type=int, default=2000)
+    db_parser.add_argument("--threads", type=int, default=server.WORKERS)
+    db_parser.add_argument("--weight-bytes", type=int, default=64 * 1024)
+    db_parser.set_defaults(func=bench_db)
+    load_parser = sub.add_parser("load", help="simulated DQN workers against a live server")
+    load_parser.add_argument("--workers", type=int, default=16)
+    load_parser.add_argument("--maps", type=int, default=4)
+    load_parser.add_argument("--rounds", type=int, default=3, help="allocate/release cycles per worker")
+    load_parser.add_argument("--saves", type=int, default=5, help="checkpoints per round")
+    load_parser.add_argument("--save-interval", type=float, default=0.0, help="seconds between saves")
+    load_parser.add_argument("--hidden-layers", type=layer_sizes, default=[64, 64])
+    load_parser.set_defaults(func=bench_load)
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Content-addressed weight storage for the DeepRL backend.
+Every distinct weight buffer is stored once in rl_weight_blobs under its
+SHA-256 hex digest; rl_models and rl_model_versions rows reference it
+through weight_hash, so forks, versions and unchanged re-saves share one copy.
+
+A blob's bytes live either in the row's data column or, when stored with a
+weights_dir, in an immutable file at weights_dir/<hash[:2]>/<hash> (in_file=1).
+"""
+
+import hashlib
+import io
+import mmap
+import os
+from contextlib import contextmanager
+from functools import partial
+
+COPY_CHUNK_BYTES = 64 * 1024
+
+
+def weight_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class HashingWriter:
+    """Writes through to a file object while hashing and counting the bytes"""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.fileobj.write(data)
+        self.hasher.update(data)
+        self.size += len(data)
+
+    def hexdigest(self):
+        return self.hasher.hexdigest()
+
+
+def create_blob_table(conn):
+    conn.execute(
+        """
+        CREATE TABLE rl_weight_blobs (
+            hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            data BLOB NOT NULL
+        )
+        """
+    )
+
+
+def blob_path(weights_dir, digest):
+    return os.path.join(weights_dir, digest[:2], digest)
+
+
+def write_blob_file(weights_dir, digest, fileobj):
+    """Write fileobj to the blob's file via a temp file, so readers never see
+    a partial file.
+    """
+    path = blob_path(weights_dir, digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as out:
+        while True:
+            chunk = fileobj.read(COPY_CHUNK_BYTES)
+            if not chunk:
+                break
+            out.write(chunk)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(temp_path, path)
+
+
+def store_blob(conn, digest, size, fileobj, weights_dir=None):
+    """Store fileobj's content under digest unless it is already present.
+
+    Returns True if the blob was new. Known content is never read back from
+    fileobj, which makes identical re-saves a single indexed lookup. With
+    weights_dir the bytes go to a file instead of the database.
+    """
+    cursor = conn.execute(
+        """
+        INSERT OR IGNORE INTO rl_weight_blobs (hash, size, data, in_file)
+        VALUES (?, ?, zeroblob(?), ?)
+        """,
+        (digest, size, 0 if weights_dir else size, 1 if weights_dir else 0),
+    )
+    if cursor.rowcount == 0:
+        return False
+    fileobj.seek(0)
+    if weights_dir:
+        write_blob_file(weights_dir, digest, fileobj)
+        return True
+    if not hasattr(conn, "blobopen"):
+        # Incremental blob I/O needs Python 3.11+.
+        conn.execute(
+            "UPDATE rl_weight_blobs SET data = ? WHERE hash = ?", (fileobj.read(), digest)
+        )
+        return True
+    if size:
+        with conn.blobopen("rl_weight_blobs", "data", cursor.lastrowid) as blob:
+            while True:
+                chunk = fileobj.read(COPY_CHUNK_BYTES)
+                if not chunk:
+                    break
+                blob.write(chunk)
+    return True
+
+
+def store_blob_bytes(conn, data, weights_dir=None):
+    """Store an in-memory buffer; returns its digest"""
+    digest = weight_hash(data)
+    if weights_dir:
+        store_blob(conn, digest, len(data), io.BytesIO(data), weights_dir)
+        return digest
+    conn.execute(
+        "INSERT OR IGNORE INTO rl_weight_blobs (hash, size, data) VALUES (?, ?, ?)",
+        (digest, len(data), data),
+    )
+    return digest
+
+
+@contextmanager
+def map_blob_file(weights_dir, digest, size):
+    """Yield a read-only mmap of a file-backed blob (b"" when empty)"""
+    if size == 0:
+        yield b""
+        return
+    with open(blob_path(weights_dir, digest), "rb") as handle:
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def remove_blob_file(conn, weights_dir, digest):
+    """Remove a released blob's file unless a later save stored it again"""
+    # The write lock keeps another save from re-adding the blob while its
+    # row is checked and its file removed.
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("SELECT 1 FROM rl_weight_blobs WHERE hash = ?", (digest,)).fetchone():
+            return
+        try:
+            os.remove(blob_path(weights_dir, digest))
+        except OSError:
+            # collect_garbage() sweeps the leftover file on the next start.
+            pass
+
+
+def release_blob(conn, digest, weights_dir):
+    """Delete the blob if no model or version references it any more.
+
+    A file-backed blob's file is removed through conn.after_commit(), so a
+    transaction that rolls back keeps both the row and its file.
+    """
+    if digest is None:
+        return
+    row = conn.execute(
+        """
+        SELECT in_file FROM rl_weight_blobs WHERE hash = :hash
+        AND NOT EXISTS (SELECT 1 FROM rl_models WHERE weight_hash = :hash)
+        AND NOT EXISTS (SELECT 1 FROM rl_model_versions WHERE weight_hash = :hash)
+        """,
+        {"hash": digest},
+    ).fetchone()
+    if not row:
+        return
+    conn.execute("DELETE FROM rl_weight_blobs WHERE hash = ?", (digest,))
+    if row[0]:
+        conn.after_commit(partial(remove_blob_file, conn, weights_dir, digest))
+
+
+def remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def collect_garbage(conn, weights_dir):
+    """Delete every unreferenced blob, and any file in weights_dir that no
+    blob row owns; returns how many rows were removed.
+    """
+    cursor = conn.execute(
+        """
+        DELETE FROM rl_weight_blobs
+        WHERE NOT EXISTS (SELECT 1 FROM rl_models WHERE weight_hash = rl_weight_blobs.hash)
+        AND NOT EXISTS (
+            SELECT 1 FROM rl_model_versions WHERE weight_hash = rl_weight_blobs.hash
+        )
+        """
+    )
+    if os.path.isdir(weights_dir):
+        owned = {
+            row[0] for row in conn.execute("SELECT hash FROM rl_weight_blobs WHERE in_file = 1")
+        }
+        stale = [
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(weights_dir)
+            for name in names
+            if name not in owned
+        ]
+        # Files of the rows deleted above must outlive a rollback.
+        conn.after_commit(partial(remove_files, stale))
+    return cursor.rowcount
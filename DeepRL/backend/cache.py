@@ -0,0 +1,89 @@
+"""
+Response cache for the DeepRL backend.
+A thread-safe LRU of ready-to-send responses, bounded by total body bytes.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """Byte-bounded LRU cache keyed by (model_key, variant)"""
+
+    def __init__(self, max_bytes):
+        """
+        Args:
+            max_bytes: Upper bound on the summed size of cached bodies; 0 disables caching
+        """
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._variants = {}  # model_key -> set of variants currently cached
+        # Bumped by every invalidate. One counter for all keys keeps the
+        # cache's bookkeeping bounded by its entries; a put racing any
+        # invalidate is dropped, which only costs a later miss.
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def generation(self):
+        """Snapshot to pass to put(); a put after an invalidate is dropped."""
+        with self._lock:
+            return self._generation
+
+    def get(self, model_key, variant):
+        with self._lock:
+            entry = self._entries.get((model_key, variant))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((model_key, variant))
+            self.hits += 1
+            return entry[0]
+
+    def put(self, model_key, variant, value, size, generation):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if self._generation != generation:
+                return
+            self._remove((model_key, variant))
+            self._entries[(model_key, variant)] = (value, size)
+            self._variants.setdefault(model_key, set()).add(variant)
+            self.size += size
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, model_key):
+        with self._lock:
+            self._generation += 1
+            for variant in list(self._variants.get(model_key, ())):
+                self._remove((model_key, variant))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= entry[1]
+        variants = self._variants.get(key[0])
+        if variants is not None:
+            variants.discard(key[1])
+            if not variants:
+                del self._variants[key[0]]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,242 @@
+"""
+Incremental JSON envelope parser for the DeepRL backend.
+Reads a top-level JSON object from a byte stream in bounded chunks, keeping
+small fields as raw source text and streaming selected large string fields
+straight to a sink.
+"""
+
+import base64
+import binascii
+import json
+import re
+
+WHITESPACE = b" \t\n\r"
+# Bytes that can change the scanner state inside a nested value.
+STRUCTURAL = re.compile(rb'["\\{}\[\]]')
+STRING_SPECIAL = re.compile(rb'["\\]')
+SCALAR_END = re.compile(rb"[,}\]\s]")
+
+
+class BodyReader:
+    """Reads exactly `length` bytes from a file object, one chunk at a time"""
+
+    def __init__(self, rfile, length, chunk_size=64 * 1024):
+        self.rfile = rfile
+        self.remaining = length
+        self.chunk_size = chunk_size
+
+    def read(self):
+        """Return the next chunk, or b"" once the body is exhausted"""
+        if self.remaining <= 0:
+            return b""
+        chunk = self.rfile.read(min(self.chunk_size, self.remaining))
+        if not chunk:
+            raise ValueError("Request body ended early")
+        self.remaining -= len(chunk)
+        return chunk
+
+    def drain(self):
+        while self.read():
+            pass
+
+
+class Base64Sink:
+    """Decodes base64 text written in arbitrary pieces into a binary file"""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.pending = b""
+        self.size = 0
+
+    def write(self, data):
+        data = self.pending + bytes(data)
+        usable = len(data) - len(data) % 4
+        self.pending = data[usable:]
+        if usable:
+            self._emit(data[:usable])
+
+    def close(self):
+        if self.pending:
+            self._emit(self.pending)
+            self.pending = b""
+
+    def _emit(self, data):
+        try:
+            decoded = base64.b64decode(data, validate=True)
+        except binascii.Error as error:
+            raise ValueError(f"Invalid base64 data: {error}") from error
+        self.fileobj.write(decoded)
+        self.size += len(decoded)
+
+
+class EnvelopeParser:
+    """Parses one top-level JSON object from a BodyReader.
+
+    Only one field value is held in memory at a time. Fields named in
+    `streams` whose value is a string are unescaped chunk by chunk into the
+    matching sink's write() instead of being buffered.
+    """
+
+    def __init__(self, reader, streams=None):
+        self.reader = reader
+        self.streams = streams or {}
+        self.buf = bytearray()
+        self.pos = 0
+        self.eof = False
+
+    def parse(self):
+        """Return {key: (raw_text, value)} for every non-streamed field"""
+        fields = {}
+        self._expect(b"{")
+        if self._peek() == b"}":
+            self.pos += 1
+        else:
+            while True:
+                key = self._read_key()
+                self._expect(b":")
+                sink = self.streams.get(key)
+                if sink is not None and self._peek() == b'"':
+                    self.pos += 1
+                    self._stream_string(sink)
+                    fields.pop(key, None)
+                else:
+                    fields[key] = self._read_value()
+                self._compact()
+                separator = self._peek()
+                self.pos += 1
+                if separator == b"}":
+                    break
+                if separator != b",":
+                    raise ValueError(f"Expected ',' or '}}' but found {separator!r}")
+        if self._peek() != b"":
+            raise ValueError("Extra data after JSON object")
+        return fields
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.reader.read()
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def _compact(self):
+        del self.buf[:self.pos]
+        self.pos = 0
+
+    def _peek(self):
+        """Skip whitespace and return the next byte without consuming it"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return bytes(self.buf[self.pos:self.pos + 1])
+            self._compact()
+            if not self._fill():
+                return b""
+
+    def _expect(self, token):
+        found = self._peek()
+        if found != token:
+            raise ValueError(f"Expected {token!r} but found {found!r}")
+        self.pos += 1
+
+    def _find(self, pattern, start, allow_eof=False):
+        """Search buf from `start`, reading more chunks until a match.
+
+        At the end of the body this returns None if allow_eof, else raises.
+        """
+        while True:
+            match = pattern.search(self.buf, start)
+            if match:
+                return match
+            start = len(self.buf)
+            if not self._fill():
+                if allow_eof:
+                    return None
+                raise ValueError("Unexpected end of JSON body")
+
+    def _read_key(self):
+        if self._peek() != b'"':
+            raise ValueError("Expected a property name")
+        start = self.pos
+        end = self._string_end(self.pos + 1)
+        self.pos = end
+        return json.loads(self.buf[start:end].decode("utf-8"))
+
+    def _string_end(self, index):
+        """Index just past the closing quote of a string whose body starts at `index`"""
+        while True:
+            match = self._find(STRING_SPECIAL, index)
+            if match.group() == b'"':
+                return match.end()
+            index = match.end() + 1
+            while index > len(self.buf):
+                if not self._fill():
+                    raise ValueError("Unexpected end of JSON body")
+
+    def _read_value(self):
+        first = self._peek()
+        start = self.pos
+        if first == b'"':
+            end = self._string_end(start + 1)
+        elif first in (b"{", b"["):
+            end = self._container_end(start)
+        elif first:
+            match = self._find(SCALAR_END, start, allow_eof=True)
+            end = match.start() if match else len(self.buf)
+        else:
+            raise ValueError("Unexpected end of JSON body")
+        raw = self.buf[start:end].decode("utf-8")
+        self.pos = end
+        return raw, json.loads(raw)
+
+    def _container_end(self, start):
+        depth = 0
+        index = start
+        in_string = False
+        while True:
+            match = self._find(STRING_SPECIAL if in_string else STRUCTURAL, index)
+            token = match.group()
+            index = match.end()
+            if in_string:
+                if token == b"\\":
+                    index += 1
+                    while index > len(self.buf):
+                        if not self._fill():
+                            raise ValueError("Unexpected end of JSON body")
+                else:
+                    in_string = False
+            elif token == b'"':
+                in_string = True
+            elif token in (b"{", b"["):
+                depth += 1
+            elif token in (b"}", b"]"):
+                depth -= 1
+                if depth == 0:
+                    return index
+
+    def _stream_string(self, sink):
+        while True:
+            match = STRING_SPECIAL.search(self.buf, self.pos)
+            if not match:
+                sink.write(self.buf[self.pos:])
+                self.buf.clear()
+                self.pos = 0
+                if not self._fill():
+                    raise ValueError("Unexpected end of JSON body")
+                continue
+            sink.write(self.buf[self.pos:match.start()])
+            self.pos = match.end()
+            if match.group() == b'"':
+                return
+            while self.pos >= len(self.buf):
+                if not self._fill():
+                    raise ValueError("Unexpected end of JSON body")
+            escaped = bytes(self.buf[self.pos:self.pos + 1])
+            if escaped not in (b"/", b"\\", b'"'):
+                raise ValueError("Unsupported escape in streamed string field")
+            sink.write(escaped)
+            self.pos += 1
@@ -1,21 +1,432 @@
 import base64
+import hashlib
 import json
+import operator
 import os
+import selectors
+import signal
+import socket
 import sqlite3
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from urllib.parse import urlparse, unquote, parse_qs
 
+from blobstore import (
+    HashingWriter,
+    blob_path,
+    collect_garbage,
+    create_blob_table,
+    map_blob_file,
+    release_blob,
+    store_blob,
+    weight_hash,
+)
+from cache import ResponseCache
+from jsonstream import Base64Sink, BodyReader, EnvelopeParser
+from metrics import Counter, Histogram, render, render_samples
+from writebehind import WriteBehindQueue
+
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(ROOT_DIR, "rl-models.db")
 HOST = "127.0.0.1"
 PORT = int(os.getenv("PORT", "5050"))
+# Number of request worker threads; 1 serves one request at a time.
+WORKERS = int(os.getenv("WORKERS", "8"))
+# Connections that wait this long for a request line and headers are closed;
+# once a request is being served there is no time limit.
+IDLE_TIMEOUT_SECONDS = float(os.getenv("IDLE_TIMEOUT_SECONDS", "15"))
+# Open client connections, busy or idle. At the cap the longest-idle
+# connection is closed to make room, or the new one is refused.
+MAX_CONNECTIONS = int(os.getenv("MAX_CONNECTIONS", "256"))
+# Allocated keys not released within this many seconds become free again.
+# Every save to a key renews its lease.
+LEASE_SECONDS = float(os.getenv("LEASE_SECONDS", "3600"))
+# map_key -> FreeList, loaded from the rl_models.map_key index on first use.
 FREE_LIST = {}
 LAST_POPPED = {}
+# Guards FREE_LIST and LAST_POPPED, which are shared by all request threads.
+ALLOC_LOCK = threading.Lock()
+# WAL lets readers run alongside a writer; NORMAL only fsyncs at checkpoints.
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHED_STATEMENTS = 256
+# Requests with a larger Content-Length are rejected with 413.
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", str(256 * 1024 * 1024)))
+# Uploaded weights are spooled in memory up to this size, then to a temp file.
+SPOOL_MEMORY_BYTES = 1024 * 1024
+# Loads retried when a concurrent save deletes the blob file a read selected.
+BLOB_READ_ATTEMPTS = 3
+# Largest JSON header accepted in a PATCH /api/rl-weights/ body.
+MAX_PATCH_HEADER_BYTES = 1024 * 1024
+# A weight PATCH is applied this many bytes at a time (a multiple of every
+# dtype size), so its memory use does not grow with the model.
+PATCH_CHUNK_BYTES = 256 * 1024
+# Versions kept per model: the newest VERSION_KEEP_LAST, plus the newest
+# version of each of the last VERSION_KEEP_HOURLY clock hours with saves.
+VERSION_KEEP_LAST = int(os.getenv("VERSION_KEEP_LAST", "10"))
+VERSION_KEEP_HOURLY = int(os.getenv("VERSION_KEEP_HOURLY", "24"))
+# "sqlite" keeps weight blobs in the database; "files" writes new blobs to
+# the weights/ directory next to it and serves them with sendfile.
+WEIGHT_STORE = os.getenv("WEIGHT_STORE", "sqlite")
+# Byte budget for cached GET /api/rl-model/ and /api/rl-weights/ bodies; 0 disables.
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE = ResponseCache(CACHE_MAX_BYTES)
+CachedBody = namedtuple("CachedBody", "etag body")
+# Bodies smaller than this are always sent uncompressed.
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_LEVEL = 6
+# Content-Encoding -> zlib wbits, in server preference order.
+CONTENT_ENCODINGS = {"gzip": 31, "deflate": 15}
+# Seconds a save may wait in memory so later saves to the same key replace
+# it; 0 writes every save before answering. Queued saves are written on a
+# clean shutdown (Ctrl+C or SIGTERM) but lost if the process is killed.
+WRITE_BEHIND_SECONDS = float(os.getenv("WRITE_BEHIND_SECONDS", "0"))
+# Queued weight bytes that trigger a flush before the timer fires.
+WRITE_BEHIND_MAX_BYTES = int(os.getenv("WRITE_BEHIND_MAX_BYTES", str(64 * 1024 * 1024)))
+WRITE_BEHIND = None  # WriteBehindQueue, created by main() when enabled
+# Page size of GET /api/rl-models, and the largest limit a client may ask for.
+MODEL_LIST_LIMIT = 100
+MODEL_LIST_MAX_LIMIT = 1000
+# Most models one GET /api/rl-batch may return.
+BATCH_MAX_KEYS = int(os.getenv("BATCH_MAX_KEYS", "100"))
+# Route labels for request metrics; other paths are counted as "other".
+METRIC_ROUTES = {
+    "health", "metrics", "rl-allocate", "rl-release", "rl-model", "rl-weights",
+    "rl-versions", "rl-rollback", "rl-batch", "rl-cache", "rl-models",
+}
+REQUESTS = Counter(
+    "rl_http_requests_total", "HTTP requests handled.", ("route", "method", "status")
+)
+REQUEST_SECONDS = Histogram(
+    "rl_http_request_duration_seconds",
+    "Time from reading the request line to sending the response.",
+    ("route", "method"),
+)
+REQUEST_BYTES = Counter(
+    "rl_http_request_body_bytes_total", "Request body bytes read.", ("route",)
+)
+RESPONSE_BYTES = Counter(
+    "rl_http_response_body_bytes_total", "Response body bytes sent.", ("route",)
+)
+SQLITE_SECONDS = Histogram(
+    "rl_sqlite_statement_duration_seconds",
+    "Time spent executing SQLite statements and commits.",
+    ("statement",),
+)
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+
+
+class TimedConnection(sqlite3.Connection):
+    """sqlite3 connection that records statement and commit times, and runs
+    after_commit() callbacks once the transaction that queued them commits
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._after_commit = []
+
+    def after_commit(self, callback):
+        """Call callback after the current transaction commits; a rollback
+        drops it.
+        """
+        self._after_commit.append(callback)
+
+    def commit(self):
+        super().commit()
+        self._run_after_commit()
+
+    def rollback(self):
+        self._after_commit.clear()
+        super().rollback()
+
+    def _run_after_commit(self):
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            statement = sql.lstrip().split(None, 1)[0].upper()
+            SQLITE_SECONDS.observe(time.perf_counter() - start, statement)
+
+    def __exit__(self, *exc_info):
+        # `with conn:` commits from C, bypassing a Python-level commit().
+        start = time.perf_counter()
+        try:
+            result = super().__exit__(*exc_info)
+        except BaseException:
+            self._after_commit.clear()
+            raise
+        finally:
+            SQLITE_SECONDS.observe(time.perf_counter() - start, "COMMIT")
+        if exc_info[0] is None:
+            self._run_after_commit()
+        else:
+            self._after_commit.clear()
+        return result
+
+
+def connect_db(path):
+    conn = sqlite3.connect(
+        path,
+        factory=TimedConnection,
+        timeout=30,
+        check_same_thread=False,
+        cached_statements=SQLITE_CACHED_STATEMENTS,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    return conn
+
+
+def get_conn():
+    """Return this thread's persistent connection, opening it on first use.
+
+    Each pool thread keeps one connection for its lifetime, so sqlite3's
+    per-connection statement cache reuses prepared statements across requests.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_PATH:
+        conn = connect_db(DB_PATH)
+        _local.conn = conn
+        _local.path = DB_PATH
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+
+def close_connections():
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+
+
+def b64decode_or_empty(text):
+    if not text:
+        return b""
+    return base64.b64decode(text)
+
+
+def migrate_weight_blob(conn):
+    # v1 stored weights as base64 TEXT; rebuild the table with a BLOB column.
+    conn.create_function("b64decode", 1, b64decode_or_empty, deterministic=True)
+    conn.execute("ALTER TABLE rl_models RENAME TO rl_models_v1")
+    conn.execute(
+        """
+        CREATE TABLE rl_models (
+            model_key TEXT PRIMARY KEY,
+            model_json TEXT NOT NULL,
+            weight_specs TEXT NOT NULL,
+            weight_data BLOB NOT NULL,
+            training_config TEXT,
+            metadata TEXT,
+            updated_at TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO rl_models (
+            model_key, model_json, weight_specs, weight_data,
+            training_config, metadata, updated_at
+        )
+        SELECT model_key, model_json, weight_specs, b64decode(weight_data_base64),
+               training_config, metadata, updated_at
+        FROM rl_models_v1
+        """
+    )
+    conn.execute("DROP TABLE rl_models_v1")
+
+
+def migrate_allocation_state(conn):
+    # Index models by map and persist leases so the allocator no longer has
+    # to scan and parse every metadata row at startup.
+    conn.create_function("record_map_key", 2, record_map_key, deterministic=True)
+    conn.execute("ALTER TABLE rl_models ADD COLUMN map_key TEXT")
+    conn.execute("UPDATE rl_models SET map_key = record_map_key(model_key, metadata)")
+    conn.execute("CREATE INDEX idx_rl_models_map_key ON rl_models (map_key, model_key)")
+    conn.execute(
+        """
+        CREATE TABLE rl_leases (
+            model_key TEXT PRIMARY KEY,
+            map_key TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_rl_leases_expiry ON rl_leases (map_key, expires_at)")
+
+
+def migrate_weight_store(conn):
+    # Move weights into the content-addressed rl_weight_blobs table; rows
+    # keep only the hash, so identical weights are stored once.
+    conn.create_function("sha256", 1, weight_hash, deterministic=True)
+    conn.execute("ALTER TABLE rl_models RENAME TO rl_models_v2")
+    conn.execute(
+        """
+        CREATE TABLE rl_models (
+            model_key TEXT PRIMARY KEY,
+            model_json TEXT NOT NULL,
+            weight_specs TEXT NOT NULL,
+            weight_hash TEXT,
+            training_config TEXT,
+            metadata TEXT,
+            updated_at TEXT NOT NULL,
+            map_key TEXT
+        )
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO rl_models (
+            model_key, model_json, weight_specs, weight_hash,
+            training_config, metadata, updated_at, map_key
+        )
+        SELECT model_key, model_json, weight_specs, sha256(weight_data),
+               training_config, metadata, updated_at, map_key
+        FROM rl_models_v2
+        """
+    )
+    create_blob_table(conn)
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO rl_weight_blobs (hash, size, data)
+        SELECT m.weight_hash, length(o.weight_data), o.weight_data
+        FROM rl_models AS m JOIN rl_models_v2 AS o ON o.model_key = m.model_key
+        """
+    )
+    conn.execute("DROP TABLE rl_models_v2")
+    conn.execute("CREATE INDEX idx_rl_models_map_key ON rl_models (map_key, model_key)")
+    conn.execute("CREATE INDEX idx_rl_models_weight_hash ON rl_models (weight_hash)")
+
+
+def migrate_blob_files(conn):
+    # Blobs with in_file = 1 keep their bytes in weights_dir() instead of data.
+    conn.execute(
+        "ALTER TABLE rl_weight_blobs ADD COLUMN in_file INTEGER NOT NULL DEFAULT 0"
+    )
+
+
+def migrate_model_versions(conn):
+    # Every save becomes a row in rl_model_versions; rl_models holds the head
+    # version's content, so reads are unchanged and a rollback copies one row.
+    conn.execute(
+        """
+        CREATE TABLE rl_model_versions (
+            model_key TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            model_json TEXT NOT NULL,
+            weight_specs TEXT NOT NULL,
+            weight_hash TEXT,
+            training_config TEXT,
+            metadata TEXT,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (model_key, version)
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX idx_rl_model_versions_weight_hash ON rl_model_versions (weight_hash)"
+    )
+    conn.execute("ALTER TABLE rl_models ADD COLUMN head_version INTEGER")
+    conn.execute(
+        """
+        INSERT INTO rl_model_versions (
+            model_key, version, model_json, weight_specs, weight_hash,
+            training_config, metadata, created_at
+        )
+        SELECT model_key, 1, model_json, weight_specs, weight_hash,
+               training_config, metadata, updated_at
+        FROM rl_models
+        """
+    )
+    conn.execute("UPDATE rl_models SET head_version = 1")
+
+
+# Projection of the training stats a model's userDefinedMetadata carries,
+# selected with the weight size; rows never contain the metadata text itself.
+MODEL_STATS_SELECT = """
+    SELECT m.model_key, m.map_key, m.updated_at, COALESCE(b.size, 0),
+           CASE WHEN json_valid(m.metadata) THEN json_extract(m.metadata, '$.episodes') END,
+           CASE WHEN json_valid(m.metadata) THEN json_extract(m.metadata, '$.steps') END,
+           CASE WHEN json_valid(m.metadata) THEN json_extract(m.metadata, '$.loss') END
+    FROM rl_models AS m LEFT JOIN rl_weight_blobs AS b ON b.hash = m.weight_hash
+"""
+
+
+def migrate_model_stats(conn):
+    # Listing models reads this narrow table instead of rl_models, whose rows
+    # carry the full topology JSON.
+    conn.execute(
+        """
+        CREATE TABLE rl_model_stats (
+            model_key TEXT PRIMARY KEY,
+            map_key TEXT,
+            updated_at TEXT NOT NULL,
+            weight_bytes INTEGER NOT NULL,
+            episodes INTEGER,
+            steps INTEGER,
+            loss REAL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_rl_model_stats_map_key ON rl_model_stats (map_key, model_key)")
+    conn.execute(
+        f"""
+        INSERT INTO rl_model_stats (
+            model_key, map_key, updated_at, weight_bytes, episodes, steps, loss
+        )
+        {MODEL_STATS_SELECT}
+        """
+    )
+
+
+# Applied in order; PRAGMA user_version records how many have run.
+MIGRATIONS = [
+    migrate_weight_blob,
+    migrate_allocation_state,
+    migrate_weight_store,
+    migrate_blob_files,
+    migrate_model_versions,
+    migrate_model_stats,
+]
+
+
+def weights_dir():
+    return os.path.join(os.path.dirname(DB_PATH), "weights")
+
+
+def blob_target():
+    """Directory new weight blobs are written to, or None to keep them in SQLite"""
+    return weights_dir() if WEIGHT_STORE == "files" else None
+
+
+@contextmanager
+def open_weight_blob(data, in_file, digest, size):
+    """Yield a blob's bytes, memory-mapping it when it lives in a file"""
+    if not in_file:
+        yield data or b""
+        return
+    with map_blob_file(weights_dir(), digest, size) as mapped:
+        yield mapped
 
 
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
+    with connect_db(DB_PATH) as conn:
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS rl_models (
@@ -29,7 +440,16 @@ def init_db():
             )
             """
         )
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < len(MIGRATIONS):
+            conn.execute("BEGIN IMMEDIATE")
+            for index in range(version, len(MIGRATIONS)):
+                MIGRATIONS[index](conn)
+                conn.execute(f"PRAGMA user_version = {index + 1}")
+        # Blobs orphaned by a crash between a save and its cleanup.
+        collect_garbage(conn, weights_dir())
         conn.commit()
+    conn.close()
 
 
 def map_key_from_record(model_key, metadata):
@@ -40,22 +460,445 @@ def map_key_from_record(model_key, metadata):
     return "default"
 
 
-def rebuild_free_list():
-    global FREE_LIST
-    FREE_LIST = {}
-    with sqlite3.connect(DB_PATH) as conn:
+def record_map_key(model_key, metadata_json):
+    metadata = None
+    if metadata_json:
+        try:
+            metadata = json.loads(metadata_json)
+        except json.JSONDecodeError:
+            metadata = None
+    return map_key_from_record(model_key, metadata)
+
+
+class FreeList:
+    """FIFO of free model keys for one map with O(1) push, pop and membership"""
+
+    def __init__(self, keys=()):
+        self.queue = deque()
+        self.members = set()
+        for key in keys:
+            self.push(key)
+
+    def push(self, key):
+        if key not in self.members:
+            self.queue.append(key)
+            self.members.add(key)
+
+    def pop(self):
+        if not self.queue:
+            return None
+        key = self.queue.popleft()
+        self.members.discard(key)
+        return key
+
+    def __len__(self):
+        return len(self.queue)
+
+
+def free_list_for(conn, map_key):
+    """Return the FreeList for map_key, loading it on first use.
+
+    Callers must hold ALLOC_LOCK. Free keys are this map's models without a
+    live lease.
+    """
+    free_list = FREE_LIST.get(map_key)
+    if free_list is None:
         rows = conn.execute(
-            "SELECT model_key, metadata FROM rl_models"
-        ).fetchall()
-    for model_key, metadata_json in rows:
-        metadata = None
-        if metadata_json:
+            """
+            SELECT model_key FROM rl_models AS m
+            WHERE map_key = ? AND NOT EXISTS (
+                SELECT 1 FROM rl_leases AS l
+                WHERE l.model_key = m.model_key AND l.expires_at > ?
+            )
+            ORDER BY model_key
+            """,
+            (map_key, time.time()),
+        )
+        free_list = FreeList(row[0] for row in rows)
+        FREE_LIST[map_key] = free_list
+    return free_list
+
+
+def reclaim_expired_leases(conn, map_key, free_list):
+    now = time.time()
+    rows = conn.execute(
+        """
+        SELECT l.model_key FROM rl_leases AS l
+        JOIN rl_models AS m ON m.model_key = l.model_key
+        WHERE l.map_key = ? AND l.expires_at <= ?
+        """,
+        (map_key, now),
+    ).fetchall()
+    conn.execute(
+        "DELETE FROM rl_leases WHERE map_key = ? AND expires_at <= ?",
+        (map_key, now),
+    )
+    for (model_key,) in rows:
+        free_list.push(model_key)
+
+
+def lease_model_key(conn, model_key, map_key):
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO rl_leases (model_key, map_key, expires_at)
+        VALUES (?, ?, ?)
+        """,
+        (model_key, map_key, time.time() + LEASE_SECONDS),
+    )
+
+
+def renew_lease(conn, model_key):
+    conn.execute(
+        "UPDATE rl_leases SET expires_at = ? WHERE model_key = ?",
+        (time.time() + LEASE_SECONDS, model_key),
+    )
+
+
+def fork_model(conn, source_key, model_key, map_key):
+    """Copy source_key's row to model_key inside SQLite; True if it existed.
+
+    The fork shares the source's weight blob until either model is saved.
+    """
+    cursor = conn.execute(
+        """
+        INSERT INTO rl_models (
+            model_key, model_json, weight_specs, weight_hash,
+            training_config, metadata, updated_at, map_key
+        )
+        SELECT ?, model_json, weight_specs, weight_hash,
+               training_config, metadata, ?, ?
+        FROM rl_models WHERE model_key = ?
+        """,
+        (model_key, datetime.utcnow().isoformat() + "Z", map_key, source_key),
+    )
+    if cursor.rowcount == 0:
+        return False
+    refresh_model_stats(conn, model_key)
+    return True
+
+
+def record_version(conn, model_key):
+    """Snapshot model_key's current row as a new head version, then prune"""
+    version = conn.execute(
+        "SELECT COALESCE(MAX(version), 0) + 1 FROM rl_model_versions WHERE model_key = ?",
+        (model_key,),
+    ).fetchone()[0]
+    conn.execute(
+        """
+        INSERT INTO rl_model_versions (
+            model_key, version, model_json, weight_specs, weight_hash,
+            training_config, metadata, created_at
+        )
+        SELECT model_key, ?, model_json, weight_specs, weight_hash,
+               training_config, metadata, updated_at
+        FROM rl_models WHERE model_key = ?
+        """,
+        (version, model_key),
+    )
+    conn.execute(
+        "UPDATE rl_models SET head_version = ? WHERE model_key = ?", (version, model_key)
+    )
+    prune_versions(conn, model_key, version)
+    return version
+
+
+def prune_versions(conn, model_key, head_version):
+    """Apply the retention policy to one model's versions.
+
+    Runs on every save, so each call only has the retained versions plus the
+    one just added to look at.
+    """
+    rows = conn.execute(
+        """
+        SELECT version, created_at, weight_hash FROM rl_model_versions
+        WHERE model_key = ? ORDER BY version DESC
+        """,
+        (model_key,),
+    ).fetchall()
+    hours = []
+    expired = []
+    for index, (version, created_at, digest) in enumerate(rows):
+        hour = created_at[:13]
+        newest_in_hour = not hours or hours[-1] != hour
+        if newest_in_hour:
+            hours.append(hour)
+        if (
+            version == head_version
+            or index < VERSION_KEEP_LAST
+            or (newest_in_hour and len(hours) <= VERSION_KEEP_HOURLY)
+        ):
+            continue
+        expired.append((version, digest))
+    for version, digest in expired:
+        conn.execute(
+            "DELETE FROM rl_model_versions WHERE model_key = ? AND version = ?",
+            (model_key, version),
+        )
+        release_blob(conn, digest, weights_dir())
+
+
+def rollback_model(conn, model_key, version, updated_at):
+    """Make a stored version the head again; False if it does not exist.
+
+    Weights are referenced by hash, so this rewrites one row whatever the
+    model's size.
+    """
+    cursor = conn.execute(
+        """
+        UPDATE rl_models SET
+            (model_json, weight_specs, weight_hash, training_config, metadata) = (
+                SELECT model_json, weight_specs, weight_hash, training_config, metadata
+                FROM rl_model_versions WHERE model_key = :key AND version = :version
+            ),
+            head_version = :version,
+            updated_at = :updated_at
+        WHERE model_key = :key AND EXISTS (
+            SELECT 1 FROM rl_model_versions WHERE model_key = :key AND version = :version
+        )
+        """,
+        {"key": model_key, "version": version, "updated_at": updated_at},
+    )
+    if cursor.rowcount == 0:
+        return False
+    refresh_model_stats(conn, model_key)
+    return True
+
+
+def refresh_model_stats(conn, model_key):
+    """Rewrite model_key's rl_model_stats row from its rl_models row"""
+    conn.execute(
+        f"""
+        INSERT OR REPLACE INTO rl_model_stats (
+            model_key, map_key, updated_at, weight_bytes, episodes, steps, loss
+        )
+        {MODEL_STATS_SELECT}
+        WHERE m.model_key = ?
+        """,
+        (model_key,),
+    )
+
+
+def list_model_stats(map_key, after, limit):
+    """One page of rl_model_stats in model_key order, for all maps or one.
+
+    Returns (models, next_after); next_after is None on the last page.
+    """
+    clauses = []
+    params = []
+    if map_key:
+        clauses.append("map_key = ?")
+        params.append(map_key)
+    if after:
+        clauses.append("model_key > ?")
+        params.append(after)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    rows = get_conn().execute(
+        f"""
+        SELECT model_key, map_key, updated_at, weight_bytes, episodes, steps, loss
+        FROM rl_model_stats {where} ORDER BY model_key LIMIT ?
+        """,
+        (*params, limit + 1),
+    ).fetchall()
+    models = [
+        {
+            "modelKey": model_key,
+            "mapKey": row_map_key,
+            "updatedAt": updated_at,
+            "weightBytes": weight_bytes,
+            "episodes": episodes,
+            "steps": steps,
+            "loss": loss,
+        }
+        for model_key, row_map_key, updated_at, weight_bytes, episodes, steps, loss in rows[:limit]
+    ]
+    next_after = models[-1]["modelKey"] if len(rows) > limit else None
+    return models, next_after
+
+
+def list_versions(key):
+    conn = get_conn()
+    head = conn.execute(
+        "SELECT head_version FROM rl_models WHERE model_key = ?", (key,)
+    ).fetchone()
+    if not head:
+        return None
+    rows = conn.execute(
+        """
+        SELECT v.version, v.created_at, b.size
+        FROM rl_model_versions AS v LEFT JOIN rl_weight_blobs AS b ON b.hash = v.weight_hash
+        WHERE v.model_key = ? ORDER BY v.version DESC
+        """,
+        (key,),
+    )
+    return {
+        "modelKey": key,
+        "head": head[0],
+        "versions": [
+            {"version": version, "createdAt": created_at, "weightBytes": size or 0}
+            for version, created_at, size in rows
+        ],
+    }
+
+
+def load_model_response(key, include_weights):
+    # Stored JSON columns are spliced into the response as raw UTF-8 bytes;
+    # nothing is decoded or re-encoded on the way out.
+    weight_column = "b.data" if include_weights else "NULL"
+    with get_conn() as conn:
+        row = conn.execute(
+            f"""
+            SELECT CAST(m.model_json AS BLOB), CAST(m.weight_specs AS BLOB),
+                   CAST(m.training_config AS BLOB), CAST(m.metadata AS BLOB), m.updated_at,
+                   {weight_column}, b.in_file, m.weight_hash, b.size
+            FROM rl_models AS m LEFT JOIN rl_weight_blobs AS b ON b.hash = m.weight_hash
+            WHERE m.model_key = ?
+            """,
+            (key,),
+        ).fetchone()
+    if not row:
+        return None
+    model_json, weight_specs, training_config, metadata, updated_at = row[:5]
+    parts = [
+        b'{"modelTopology": ', model_json,
+        b', "weightSpecs": ', weight_specs,
+        b', "trainingConfig": ', training_config or b"null",
+        b', "userDefinedMetadata": ', metadata or b"null",
+        b', "updatedAt": ', json.dumps(updated_at).encode("ascii"),
+    ]
+    if include_weights:
+        # Legacy clients still expect the weights inline as base64.
+        with open_weight_blob(*row[5:]) as weight_data:
+            encoded = base64.b64encode(weight_data)
+        parts += [b', "weightDataBase64": "', encoded, b'"']
+    parts.append(b"}")
+    return updated_at, b"".join(parts)
+
+
+def load_weights_response(key):
+    row = get_conn().execute(
+        """
+        SELECT m.updated_at, b.data, b.in_file, m.weight_hash, b.size
+        FROM rl_models AS m LEFT JOIN rl_weight_blobs AS b ON b.hash = m.weight_hash
+        WHERE m.model_key = ?
+        """,
+        (key,),
+    ).fetchone()
+    if not row:
+        return None
+    with open_weight_blob(*row[1:]) as weight_data:
+        return row[0], bytes(weight_data)
+
+
+def load_weight_file(key):
+    """(updated_at, path, size) when key's weights live in a file, else None"""
+    row = get_conn().execute(
+        """
+        SELECT m.updated_at, m.weight_hash, b.size
+        FROM rl_models AS m JOIN rl_weight_blobs AS b ON b.hash = m.weight_hash
+        WHERE m.model_key = ? AND b.in_file = 1
+        """,
+        (key,),
+    ).fetchone()
+    if not row:
+        return None
+    return row[0], blob_path(weights_dir(), row[1]), row[2]
+
+
+def list_map_model_keys(map_key, limit=-1):
+    rows = get_conn().execute(
+        "SELECT model_key FROM rl_models WHERE map_key = ? ORDER BY model_key LIMIT ?",
+        (map_key, limit),
+    )
+    return [row[0] for row in rows]
+
+
+def load_updated_at(key):
+    row = get_conn().execute(
+        "SELECT updated_at FROM rl_models WHERE model_key = ?",
+        (key,),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def model_etag(key, updated_at, variant):
+    # updated_at changes on every save, so it identifies the stored version.
+    digest = hashlib.sha1(f"{key}\0{updated_at}".encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}-{variant}"'
+
+
+def encoded_etag(etag, encoding):
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}+{encoding}"'
+
+
+def negotiate_encoding(accept_encoding):
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
             try:
-                metadata = json.loads(metadata_json)
-            except json.JSONDecodeError:
-                metadata = None
-        map_key = map_key_from_record(model_key, metadata)
-        FREE_LIST.setdefault(map_key, []).append(model_key)
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in CONTENT_ENCODINGS:
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress_body(body, encoding):
+    compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, CONTENT_ENCODINGS[encoding])
+    return compressor.compress(body) + compressor.flush()
+
+
+def cache_loaded_body(key, variant, loader, generation):
+    """Load key's variant and add it to RESPONSE_CACHE; None when unknown.
+
+    generation must be read before the cache lookup that missed, so a save
+    racing with the load cannot leave a stale body cached. Raises
+    FileNotFoundError if the blob file keeps vanishing under the read.
+    """
+    for attempt in range(BLOB_READ_ATTEMPTS):
+        try:
+            loaded = loader(key)
+            break
+        except FileNotFoundError:
+            # A save replaced the weights and deleted the file between the
+            # row lookup and opening it; reading the row again finds the new one.
+            if attempt == BLOB_READ_ATTEMPTS - 1:
+                raise
+    if loaded is None:
+        return None
+    updated_at, body = loaded
+    cached = CachedBody(model_etag(key, updated_at, variant), body)
+    RESPONSE_CACHE.put(key, variant, cached, len(body), generation)
+    return cached
+
+
+def get_cached_body(key, variant, loader):
+    generation = RESPONSE_CACHE.generation()
+    cached = RESPONSE_CACHE.get(key, variant)
+    if cached is None:
+        cached = cache_loaded_body(key, variant, loader, generation)
+    return cached
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
 
 
 def parse_json(body):
@@ -64,7 +907,365 @@ def parse_json(body):
     return json.loads(body.decode("utf-8"))
 
 
+def current_weight_hash(conn, key):
+    row = conn.execute(
+        "SELECT weight_hash FROM rl_models WHERE model_key = ?", (key,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def save_model_fields(conn, key, fields, weights, updated_at):
+    """Upsert key's JSON fields from a parsed POST /api/rl-model/ envelope.
+
+    weights is (spool, digest, size), or None to keep the stored weights.
+    Runs inside the caller's write transaction.
+    """
+    old_hash = current_weight_hash(conn, key)
+    digest = None
+    if weights:
+        spool, digest, size = weights
+        store_blob(conn, digest, size, spool, blob_target())
+    conn.execute(
+        """
+        INSERT INTO rl_models (
+            model_key, model_json, weight_specs, weight_hash,
+            training_config, metadata, updated_at, map_key
+        )
+        VALUES (
+            :key, :model_json, :weight_specs, :weight_hash,
+            :training_config, :metadata, :updated_at, :map_key
+        )
+        ON CONFLICT(model_key) DO UPDATE SET
+            model_json=excluded.model_json,
+            weight_specs=excluded.weight_specs,
+            weight_hash=COALESCE(excluded.weight_hash, rl_models.weight_hash),
+            training_config=excluded.training_config,
+            metadata=excluded.metadata,
+            updated_at=excluded.updated_at,
+            map_key=excluded.map_key
+        """,
+        {
+            "key": key,
+            "model_json": raw_field(fields, "modelTopology"),
+            "weight_specs": raw_field(fields, "weightSpecs"),
+            "weight_hash": digest,
+            "training_config": raw_field(fields, "trainingConfig"),
+            "metadata": raw_field(fields, "userDefinedMetadata"),
+            "updated_at": updated_at,
+            "map_key": map_key_from_record(
+                key, fields.get("userDefinedMetadata", (None, None))[1]
+            ),
+        },
+    )
+    if digest and old_hash != digest:
+        release_blob(conn, old_hash, weights_dir())
+    if digest:
+        record_version(conn, key)
+    # Without weights this is the first half of a checkpoint: dqn-worker.js
+    # sends the weights next, and that save records one version for both, so
+    # no version pairs these fields with the previous weights.
+    refresh_model_stats(conn, key)
+    renew_lease(conn, key)
+
+
+def save_weights(conn, key, weights, updated_at):
+    """Replace key's weights with (spool, digest, size); False if key is unknown"""
+    old_hash = conn.execute(
+        "SELECT weight_hash FROM rl_models WHERE model_key = ?", (key,)
+    ).fetchone()
+    if not old_hash:
+        return False
+    spool, digest, size = weights
+    store_blob(conn, digest, size, spool, blob_target())
+    conn.execute(
+        "UPDATE rl_models SET weight_hash = ?, updated_at = ? WHERE model_key = ?",
+        (digest, updated_at, key),
+    )
+    if old_hash[0] != digest:
+        release_blob(conn, old_hash[0], weights_dir())
+    record_version(conn, key)
+    refresh_model_stats(conn, key)
+    renew_lease(conn, key)
+    return True
+
+
+def write_pending_saves(batch):
+    """WriteBehindQueue writer: apply every queued save in one transaction"""
+    with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for key, entry in batch.items():
+            if entry.fields is not None:
+                save_model_fields(conn, key, entry.fields, entry.weights, entry.updated_at)
+            else:
+                save_weights(conn, key, entry.weights, entry.updated_at)
+    # A read that raced with the save may have cached the previous version.
+    for key in batch:
+        RESPONSE_CACHE.invalidate(key)
+
+
+def flush_pending(key=None):
+    """Write queued saves for key (or all keys) so a read sees them"""
+    if WRITE_BEHIND is not None:
+        WRITE_BEHIND.flush(key)
+
+
+def metric_route(path):
+    parts = urlparse(path).path.split("/")
+    if len(parts) > 2 and parts[1] == "api":
+        route = parts[2]
+    else:
+        route = parts[1] if len(parts) > 1 else ""
+    return route if route in METRIC_ROUTES else "other"
+
+
+def render_metrics(http_server):
+    with ALLOC_LOCK:
+        free_lists = [((map_key,), len(free_list)) for map_key, free_list in FREE_LIST.items()]
+    cache = RESPONSE_CACHE.stats()
+    files = []
+    for name, path in (("db", DB_PATH), ("wal", f"{DB_PATH}-wal")):
+        if os.path.exists(path):
+            files.append(((name,), os.path.getsize(path)))
+    sections = [
+        REQUESTS.render(),
+        REQUEST_SECONDS.render(),
+        REQUEST_BYTES.render(),
+        RESPONSE_BYTES.render(),
+        SQLITE_SECONDS.render(),
+        render_samples(
+            "rl_free_list_depth", "Free model keys per map.", sorted(free_lists), ("map_key",)
+        ),
+        render_samples(
+            "rl_cache_requests_total",
+            "Response cache lookups.",
+            [(("hit",), cache["hits"]), (("miss",), cache["misses"])],
+            ("result",),
+            kind="counter",
+        ),
+        render_samples(
+            "rl_cache_evictions_total", "Response cache evictions.",
+            [((), cache["evictions"])], kind="counter",
+        ),
+        render_samples("rl_cache_hit_ratio", "Response cache hit ratio.", [((), cache["hitRate"])]),
+        render_samples("rl_cache_entries", "Cached responses.", [((), cache["entries"])]),
+        render_samples("rl_cache_bytes", "Bytes of cached responses.", [((), cache["bytes"])]),
+        render_samples("rl_db_file_bytes", "SQLite file sizes.", files, ("file",)),
+    ]
+    if isinstance(http_server, PooledHTTPServer):
+        sections.append(render_samples(
+            "rl_http_open_connections", "Open client connections.",
+            [((), http_server.open_connections)],
+        ))
+        sections.append(render_samples(
+            "rl_http_idle_connections", "Keep-alive connections waiting for a request.",
+            [((), len(http_server.idle))],
+        ))
+    if WRITE_BEHIND is not None:
+        queue = WRITE_BEHIND.stats()
+        sections.append(render_samples(
+            "rl_write_behind_pending_keys", "Keys with queued saves.",
+            [((), queue["pendingKeys"])],
+        ))
+        sections.append(render_samples(
+            "rl_write_behind_pending_bytes", "Queued weight bytes.",
+            [((), queue["pendingBytes"])],
+        ))
+        sections.append(render_samples(
+            "rl_write_behind_coalesced_total", "Saves replaced by a later save before being written.",
+            [((), queue["coalesced"])], kind="counter",
+        ))
+    return render(sections)
+
+
+def raw_field(fields, name):
+    raw, value = fields.get(name, (None, None))
+    return raw if value is not None else None
+
+
+# Bytes per element for the tfjs weight dtypes (and quantized storage dtypes).
+DTYPE_BYTES = {
+    "float32": 4,
+    "int32": 4,
+    "bool": 1,
+    "complex64": 8,
+    "uint8": 1,
+    "uint16": 2,
+    "float16": 2,
+}
+
+
+def weight_spec_layout(weight_specs):
+    """Map each tensor name in weightSpecs to (offset, byte_length, dtype)."""
+    layout = {}
+    offset = 0
+    for spec in weight_specs:
+        quantization = spec.get("quantization")
+        dtype = quantization["dtype"] if quantization else spec.get("dtype", "float32")
+        if dtype not in DTYPE_BYTES:
+            raise ValueError(f"Unsupported dtype {dtype} for {spec.get('name')}")
+        count = 1
+        for dim in spec.get("shape", []):
+            count *= dim
+        length = count * DTYPE_BYTES[dtype]
+        layout[spec["name"]] = (offset, length, dtype)
+        offset += length
+    return layout
+
+
+def read_weight_patch(reader, data):
+    """Read a PATCH /api/rl-weights/ body from a BodyReader.
+
+    Layout: uint32 little-endian header length, UTF-8 JSON header
+    {"tensors": [{"name": ..., "mode": "replace" | "add"}, ...]}, then the raw
+    data of each listed tensor, back to back in header order. "add" data are
+    float32 deltas added element-wise to the stored tensor.
+
+    Returns the tensors list; the tensor data is spooled to the data file.
+    """
+    head = b""
+    while len(head) < 4:
+        chunk = reader.read()
+        if not chunk:
+            raise ValueError("Missing patch header")
+        head += chunk
+    (header_length,) = struct.unpack_from("<I", head, 0)
+    if header_length > MAX_PATCH_HEADER_BYTES:
+        raise ValueError(f"Patch header exceeds {MAX_PATCH_HEADER_BYTES} bytes")
+    header_end = 4 + header_length
+    while len(head) < header_end:
+        chunk = reader.read()
+        if not chunk:
+            raise ValueError("Truncated patch header")
+        head += chunk
+    header = json.loads(head[4:header_end].decode("utf-8"))
+    tensors = header.get("tensors") if isinstance(header, dict) else None
+    if not isinstance(tensors, list):
+        raise ValueError("Patch header needs a tensors list")
+    for tensor in tensors:
+        if not isinstance(tensor, dict) or not isinstance(tensor.get("name"), str):
+            raise ValueError("Each patched tensor needs a name")
+        if not isinstance(tensor.get("mode", "replace"), str):
+            raise ValueError(f"Bad patch mode for {tensor['name']}")
+    data.write(head[header_end:])
+    while True:
+        chunk = reader.read()
+        if not chunk:
+            break
+        data.write(chunk)
+    return tensors
+
+
+def build_model_batch(keys, include_weights):
+    """Encode several models as one GET /api/rl-batch body.
+
+    Layout (the same framing as PATCH bodies): uint32 little-endian header
+    length, UTF-8 JSON header {"models": [{"modelKey", "jsonBytes",
+    "weightBytes"}, ...], "missing": [...]}, then for each listed model its
+    JSON (as GET /api/rl-model/<key>?weights=0) followed by its raw weights.
+    """
+    models = []
+    missing = []
+    chunks = []
+    for key in keys:
+        model = get_cached_body(
+            key, "json-noweights", lambda model_key: load_model_response(model_key, False)
+        )
+        weights = None
+        if include_weights:
+            weights = get_cached_body(key, "weights", load_weights_response)
+        if model is None or (include_weights and weights is None):
+            missing.append(key)
+            continue
+        weight_body = weights.body if weights else b""
+        models.append(
+            {"modelKey": key, "jsonBytes": len(model.body), "weightBytes": len(weight_body)}
+        )
+        chunks += [model.body, weight_body]
+    header = json.dumps({"models": models, "missing": missing}).encode("utf-8")
+    return b"".join([struct.pack("<I", len(header)), header] + chunks)
+
+
+def apply_weight_patch(weight_data, weight_specs, tensors, data, out):
+    """Write weight_data with the patch applied to the file object out.
+
+    data is the seekable file read_weight_patch() spooled the tensor data to.
+    Tensors are copied or patched PATCH_CHUNK_BYTES at a time; a tensor listed
+    more than once gets its patches in header order.
+    """
+    layout = weight_spec_layout(weight_specs)
+    expected = sum(length for _, length, _ in layout.values())
+    if len(weight_data) != expected:
+        raise ValueError("Stored weights do not match weightSpecs")
+    data_size = data.seek(0, os.SEEK_END)
+    patches = {}  # tensor name -> [(mode, position of its data), ...]
+    position = 0
+    for tensor in tensors:
+        name = tensor.get("name")
+        mode = tensor.get("mode", "replace")
+        if name not in layout:
+            raise ValueError(f"Unknown tensor {name}")
+        _, length, dtype = layout[name]
+        if mode != "replace" and not (mode == "add" and dtype == "float32"):
+            raise ValueError(f"Unsupported mode {mode} for {dtype} tensor {name}")
+        if position + length > data_size:
+            raise ValueError(f"Truncated data for {name}")
+        patches.setdefault(name, []).append((mode, position))
+        position += length
+    if position != data_size:
+        raise ValueError("Patch data longer than the listed tensors")
+    with memoryview(weight_data) as stored:
+        for name, (offset, length, _) in layout.items():
+            if name not in patches:
+                out.write(stored[offset:offset + length])
+                continue
+            for start in range(0, length, PATCH_CHUNK_BYTES):
+                end = min(start + PATCH_CHUNK_BYTES, length)
+                chunk = stored[offset + start:offset + end]
+                for mode, position in patches[name]:
+                    data.seek(position + start)
+                    incoming = data.read(end - start)
+                    if mode == "replace":
+                        chunk = incoming
+                        continue
+                    values = array("f")
+                    values.frombytes(chunk)
+                    deltas = array("f")
+                    deltas.frombytes(incoming)
+                    # map() runs the additions in C, one slice at a time.
+                    chunk = array("f", map(operator.add, values, deltas)).tobytes()
+                out.write(chunk)
+
+
 class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    timeout = IDLE_TIMEOUT_SECONDS
+    # Headers and body go out in separate writes; don't let Nagle delay the body.
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        """Serve requests while the client keeps sending them.
+
+        Once no pipelined request is buffered, keep_alive asks the server to
+        park the idle socket, so it does not hold a pool thread.
+        """
+        self.keep_alive = False
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            if not self._request_buffered():
+                self.keep_alive = True
+                return
+            self.handle_one_request()
+
+    def _request_buffered(self):
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
     def _send_json(self, code, payload):
         data = json.dumps(payload).encode("utf-8")
         self.send_response(code)
@@ -73,6 +1274,143 @@ class Handler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(data)
 
+    def _send_bytes(self, code, data, content_type="application/octet-stream", headers=None):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_not_modified(self, etag):
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _send_model_body(self, key, variant, loader, content_type):
+        """Serve a cached model representation, honouring If-None-Match and
+        Accept-Encoding.
+
+        loader(key) returns (updated_at, body) or None when the key is unknown.
+        Compressed bodies are cached as their own variant, so each model
+        version is compressed at most once.
+        """
+        if_none_match = self.headers.get("If-None-Match")
+        encoding = negotiate_encoding(self.headers.get("Accept-Encoding"))
+        generation = RESPONSE_CACHE.generation()
+        cached = RESPONSE_CACHE.get(key, variant)
+        if cached is None:
+            if if_none_match:
+                # Revalidation only needs updated_at, not the full row.
+                updated_at = load_updated_at(key)
+                if updated_at:
+                    etag = model_etag(key, updated_at, variant)
+                    for candidate in (encoded_etag(etag, encoding), etag):
+                        if etag_matches(if_none_match, candidate):
+                            self._send_not_modified(candidate)
+                            return
+            try:
+                cached = cache_loaded_body(key, variant, loader, generation)
+            except FileNotFoundError:
+                self._send_json(503, {"error": "Weights changed during the read, retry"})
+                return
+            if cached is None:
+                self._send_json(404, {"error": "Model not found"})
+                return
+        headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if encoding and len(cached.body) >= COMPRESS_MIN_BYTES:
+            encoded_variant = f"{variant}+{encoding}"
+            compressed = RESPONSE_CACHE.get(key, encoded_variant)
+            if compressed is None or compressed.etag != encoded_etag(cached.etag, encoding):
+                compressed = CachedBody(
+                    encoded_etag(cached.etag, encoding),
+                    compress_body(cached.body, encoding),
+                )
+                RESPONSE_CACHE.put(
+                    key, encoded_variant, compressed, len(compressed.body), generation
+                )
+            cached = compressed
+            headers["Content-Encoding"] = encoding
+        if etag_matches(if_none_match, cached.etag):
+            self._send_not_modified(cached.etag)
+            return
+        headers["ETag"] = cached.etag
+        self._send_bytes(200, cached.body, content_type, headers)
+
+    def _send_weight_file(self, key, updated_at, path, size):
+        """Send a file-backed weight blob with sendfile, bypassing the response
+        cache and compression. Returns False if a concurrent save removed the
+        file before it was opened.
+        """
+        etag = model_etag(key, updated_at, "weights")
+        if etag_matches(self.headers.get("If-None-Match"), etag):
+            self._send_not_modified(etag)
+            return True
+        try:
+            handle = open(path, "rb") if size else None
+        except FileNotFoundError:
+            return False
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size))
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("ETag", etag)
+        self.end_headers()
+        if handle:
+            with handle:
+                self.connection.sendfile(handle, 0, size)
+        return True
+
+    def _send_save_result(self, updated_at):
+        payload = {"ok": True, "updatedAt": updated_at}
+        if WRITE_BEHIND is not None:
+            # Acknowledged but not yet on disk.
+            payload["queued"] = True
+        self._send_json(200, payload)
+
+    def _body_reader(self):
+        """Return a BodyReader for the request body, or None after answering
+        413 when it exceeds MAX_BODY_BYTES.
+        """
+        length = int(self.headers.get("Content-Length", "0"))
+        self._request_body = BodyReader(self.rfile, length)
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": f"Body exceeds {MAX_BODY_BYTES} bytes"})
+            return None
+        return self._request_body
+
+    def _read_body(self):
+        reader = self._body_reader()
+        if reader is None:
+            return None
+        data = self.rfile.read(reader.remaining)
+        reader.remaining -= len(data)
+        return data
+
+    def _body_unread(self):
+        headers = getattr(self, "headers", None)
+        if headers and "Transfer-Encoding" in headers:
+            # Chunked bodies are never read, so the framing is lost.
+            return True
+        if self._request_body is not None:
+            return self._request_body.remaining > 0
+        return bool(headers) and headers.get("Content-Length", "0") != "0"
+
+    def _flush_pending(self, key=None):
+        """flush_pending(key), or False after answering 503 if the write failed.
+
+        The failed batch stays queued and is retried by the next flush.
+        """
+        try:
+            flush_pending(key)
+        except Exception as error:
+            self.log_error("Queued save failed: %r", error)
+            self._send_json(503, {"error": "Saving queued changes failed, retry"})
+            return False
+        return True
+
     def _send_text(self, code, text):
         data = text.encode("utf-8")
         self.send_response(code)
@@ -83,13 +1421,64 @@ class Handler(BaseHTTPRequestHandler):
 
     def do_OPTIONS(self):
         self.send_response(204)
+        self.send_header("Content-Length", "0")
         self.send_header("Access-Control-Allow-Origin", "*")
-        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
-        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, PATCH, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type, If-None-Match")
         self.end_headers()
 
+    def handle_one_request(self):
+        self._status = None
+        self._response_bytes = 0
+        self._request_body = None
+        start = time.perf_counter()
+        super().handle_one_request()
+        if self._status is None:
+            # The client closed the connection without sending a request.
+            return
+        elapsed = time.perf_counter() - start
+        route = metric_route(getattr(self, "path", ""))
+        method = self.command or "-"
+        REQUESTS.inc(route, method, str(self._status))
+        REQUEST_SECONDS.observe(elapsed, route, method)
+        request_bytes = 0
+        if self._request_body is not None:
+            # Only what was read: a 413 or an early error leaves the rest.
+            declared = int(self.headers.get("Content-Length", "0"))
+            request_bytes = declared - self._request_body.remaining
+        REQUEST_BYTES.inc(route, amount=request_bytes)
+        RESPONSE_BYTES.inc(route, amount=self._response_bytes)
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        if "Transfer-Encoding" in self.headers:
+            # Only Content-Length bodies are read; a chunked body would be
+            # taken for an empty one and its chunks parsed as the next request.
+            self._send_json(411, {"error": "Send the body with a Content-Length"})
+            return False
+        # The idle timeout bounds the wait for a request line and headers,
+        # not how long serving it takes: a large upload or download may need
+        # far longer. _request_buffered() restores it for the next request.
+        self.connection.settimeout(None)
+        return True
+
+    def send_response(self, code, message=None):
+        self._status = code
+        super().send_response(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == "content-length":
+            self._response_bytes += int(value)
+        super().send_header(keyword, value)
+
     def end_headers(self):
         self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Access-Control-Expose-Headers", "ETag")
+        if self._body_unread():
+            # Whatever is left of the body would be parsed as the next
+            # request; send_header also sets close_connection.
+            self.send_header("Connection", "close")
         super().end_headers()
 
     def do_GET(self):
@@ -97,85 +1486,130 @@ class Handler(BaseHTTPRequestHandler):
         if parsed.path == "/health":
             self._send_json(200, {"ok": True})
             return
+        if parsed.path == "/metrics":
+            self._send_bytes(
+                200, render_metrics(self.server).encode("utf-8"), "text/plain; version=0.0.4"
+            )
+            return
         if parsed.path.startswith("/api/rl-allocate/"):
             map_key = unquote(parsed.path.split("/api/rl-allocate/")[1])
+            # Forks and the free list are read from saved rows.
+            if not self._flush_pending():
+                return
             query = parse_qs(parsed.query or "")
             base_key = query.get("baseKey", [None])[0] or "tank-ai-dqn"
-            free_list = FREE_LIST.get(map_key, [])
-            if free_list:
-                model_key = free_list.pop(0)
-                LAST_POPPED[map_key] = model_key
+            copied = False
+            with ALLOC_LOCK, get_conn() as conn:
+                free_list = free_list_for(conn, map_key)
+                if not free_list:
+                    reclaim_expired_leases(conn, map_key, free_list)
+                model_key = free_list.pop()
+                is_new = model_key is None
+                if is_new:
+                    suffix = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
+                    model_key = f"{base_key}-{map_key}-{suffix}"
+                    copied_from = LAST_POPPED.get(map_key)
+                    if copied_from:
+                        copied = fork_model(conn, copied_from, model_key, map_key)
+                        if copied:
+                            record_version(conn, model_key)
+                else:
+                    LAST_POPPED[map_key] = model_key
+                lease_model_key(conn, model_key, map_key)
+            if not is_new:
                 self._send_json(200, {"modelKey": model_key, "isNew": False})
-                return
-            suffix = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-            model_key = f"{base_key}-{map_key}-{suffix}"
-            copied_from = LAST_POPPED.get(map_key)
-            if copied_from:
-                with sqlite3.connect(DB_PATH) as conn:
-                    row = conn.execute(
-                        """
-                        SELECT model_json, weight_specs, weight_data_base64,
-                               training_config, metadata
-                        FROM rl_models WHERE model_key = ?
-                        """,
-                        (copied_from,),
-                    ).fetchone()
-                if row:
-                    model_json, weight_specs, weight_data, training_config, metadata = row
-                    now = datetime.utcnow().isoformat() + "Z"
-                    with sqlite3.connect(DB_PATH) as conn:
-                        conn.execute(
-                            """
-                            INSERT INTO rl_models (
-                                model_key, model_json, weight_specs, weight_data_base64,
-                                training_config, metadata, updated_at
-                            )
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                            """,
-                            (
-                                model_key,
-                                model_json,
-                                weight_specs,
-                                weight_data,
-                                training_config,
-                                metadata,
-                                now,
-                            ),
-                        )
-                        conn.commit()
-                    self._send_json(
-                        200,
-                        {"modelKey": model_key, "isNew": True, "copiedFrom": copied_from},
-                    )
-                    return
-            self._send_json(200, {"modelKey": model_key, "isNew": True})
+            elif copied:
+                self._send_json(
+                    200,
+                    {"modelKey": model_key, "isNew": True, "copiedFrom": copied_from},
+                )
+            else:
+                self._send_json(200, {"modelKey": model_key, "isNew": True})
             return
         if parsed.path.startswith("/api/rl-model/"):
             key = unquote(parsed.path.split("/api/rl-model/")[1])
-            with sqlite3.connect(DB_PATH) as conn:
-                row = conn.execute(
-                    """
-                    SELECT model_json, weight_specs, weight_data_base64,
-                           training_config, metadata, updated_at
-                    FROM rl_models WHERE model_key = ?
-                    """,
-                    (key,),
-                ).fetchone()
-            if not row:
+            if not self._flush_pending(key):
+                return
+            query = parse_qs(parsed.query or "")
+            include_weights = query.get("weights", ["1"])[0] != "0"
+            variant = "json" if include_weights else "json-noweights"
+            self._send_model_body(
+                key,
+                variant,
+                lambda model_key: load_model_response(model_key, include_weights),
+                "application/json",
+            )
+            return
+        if parsed.path.startswith("/api/rl-weights/"):
+            key = unquote(parsed.path.split("/api/rl-weights/")[1])
+            if not self._flush_pending(key):
+                return
+            stored = load_weight_file(key) if WEIGHT_STORE == "files" else None
+            if stored and self._send_weight_file(key, *stored):
+                return
+            self._send_model_body(
+                key, "weights", load_weights_response, "application/octet-stream"
+            )
+            return
+        if parsed.path.startswith("/api/rl-versions/"):
+            key = unquote(parsed.path.split("/api/rl-versions/")[1])
+            if not self._flush_pending(key):
+                return
+            versions = list_versions(key)
+            if versions is None:
                 self._send_json(404, {"error": "Model not found"})
                 return
-            model_json, weight_specs, weight_data, training_config, metadata, updated_at = row
-            self._send_json(
-                200,
-                {
-                    "modelTopology": json.loads(model_json),
-                    "weightSpecs": json.loads(weight_specs),
-                    "weightDataBase64": weight_data,
-                    "trainingConfig": json.loads(training_config) if training_config else None,
-                    "userDefinedMetadata": json.loads(metadata) if metadata else None,
-                    "updatedAt": updated_at,
-                },
+            self._send_json(200, versions)
+            return
+        if parsed.path == "/api/rl-batch":
+            if not self._flush_pending():
+                return
+            query = parse_qs(parsed.query or "")
+            include_weights = query.get("weights", ["1"])[0] != "0"
+            map_key = query.get("mapKey", [None])[0]
+            if map_key:
+                # One past the cap is enough to tell the map has too many.
+                keys = list_map_model_keys(map_key, BATCH_MAX_KEYS + 1)
+            else:
+                keys = [key for value in query.get("keys", []) for key in value.split(",") if key]
+                if not keys:
+                    self._send_json(400, {"error": "Pass keys or mapKey"})
+                    return
+            if len(keys) > BATCH_MAX_KEYS:
+                self._send_json(
+                    400, {"error": f"A batch holds at most {BATCH_MAX_KEYS} models"}
+                )
+                return
+            try:
+                body = build_model_batch(keys, include_weights)
+            except FileNotFoundError:
+                self._send_json(503, {"error": "Weights changed during the read, retry"})
+                return
+            self._send_bytes(200, body)
+            return
+        if parsed.path == "/api/rl-models":
+            if not self._flush_pending():
+                return
+            query = parse_qs(parsed.query or "")
+            try:
+                limit = int(query.get("limit", [MODEL_LIST_LIMIT])[0])
+            except ValueError:
+                limit = 0
+            if not 0 < limit <= MODEL_LIST_MAX_LIMIT:
+                self._send_json(
+                    400, {"error": f"limit must be between 1 and {MODEL_LIST_MAX_LIMIT}"}
+                )
+                return
+            models, next_after = list_model_stats(
+                query.get("mapKey", [None])[0], query.get("after", [None])[0], limit
             )
+            self._send_json(200, {"models": models, "nextAfter": next_after})
+            return
+        if parsed.path == "/api/rl-cache":
+            stats = RESPONSE_CACHE.stats()
+            if WRITE_BEHIND is not None:
+                stats["writeBehind"] = WRITE_BEHIND.stats()
+            self._send_json(200, stats)
             return
         self._send_text(404, "Not found")
 
@@ -183,70 +1617,379 @@ class Handler(BaseHTTPRequestHandler):
         parsed = urlparse(self.path)
         if parsed.path.startswith("/api/rl-release/"):
             map_key = unquote(parsed.path.split("/api/rl-release/")[1])
-            length = int(self.headers.get("Content-Length", "0"))
-            body = self.rfile.read(length)
+            body = self._read_body()
+            if body is None:
+                return
             payload = parse_json(body) or {}
             model_key = payload.get("modelKey")
             if not model_key:
                 self._send_json(400, {"error": "Missing modelKey"})
                 return
-            FREE_LIST.setdefault(map_key, []).append(model_key)
+            if not self._flush_pending(model_key):
+                return
+            with ALLOC_LOCK, get_conn() as conn:
+                conn.execute("DELETE FROM rl_leases WHERE model_key = ?", (model_key,))
+                saved = conn.execute(
+                    "SELECT 1 FROM rl_models WHERE model_key = ?", (model_key,)
+                ).fetchone()
+                if saved:
+                    free_list_for(conn, map_key).push(model_key)
             self._send_json(200, {"ok": True})
             return
+        if parsed.path.startswith("/api/rl-rollback/"):
+            key = unquote(parsed.path.split("/api/rl-rollback/")[1])
+            if not self._flush_pending(key):
+                return
+            body = self._read_body()
+            if body is None:
+                return
+            payload = parse_json(body) or {}
+            version = payload.get("version")
+            if not isinstance(version, int):
+                self._send_json(400, {"error": "Missing version"})
+                return
+            now = datetime.utcnow().isoformat() + "Z"
+            with get_conn() as conn:
+                rolled_back = rollback_model(conn, key, version, now)
+            if not rolled_back:
+                self._send_json(404, {"error": "Version not found"})
+                return
+            RESPONSE_CACHE.invalidate(key)
+            self._send_json(200, {"ok": True, "head": version, "updatedAt": now})
+            return
         if parsed.path.startswith("/api/rl-model/"):
             key = unquote(parsed.path.split("/api/rl-model/")[1])
-            length = int(self.headers.get("Content-Length", "0"))
-            body = self.rfile.read(length)
-            payload = parse_json(body) or {}
-            model_topology = payload.get("modelTopology")
-            weight_specs = payload.get("weightSpecs")
-            weight_data_base64 = payload.get("weightDataBase64")
-            if not model_topology or not weight_specs or not weight_data_base64:
-                self._send_json(400, {"error": "Missing model data"})
+            reader = self._body_reader()
+            if reader is None:
+                return
+            with ExitStack() as stack:
+                spool = stack.enter_context(
+                    tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+                )
+                # Inline base64 weights are decoded straight into the spool as
+                # they arrive; the other fields are kept as raw JSON text.
+                hashing = HashingWriter(spool)
+                sink = Base64Sink(hashing)
+                try:
+                    fields = EnvelopeParser(reader, {"weightDataBase64": sink}).parse()
+                    sink.close()
+                except ValueError as error:
+                    self._send_json(400, {"error": f"Invalid JSON: {error}"})
+                    return
+                model_topology = fields.get("modelTopology", (None, None))[1]
+                weight_specs = fields.get("weightSpecs", (None, None))[1]
+                if not model_topology or not weight_specs:
+                    self._send_json(400, {"error": "Missing model data"})
+                    return
+                # Weights may come inline (legacy base64) or separately via
+                # POST /api/rl-weights/<key>; without them the stored blob is kept.
+                weights = (spool, hashing.hexdigest(), sink.size) if sink.size else None
+                now = datetime.utcnow().isoformat() + "Z"
+                if WRITE_BEHIND is None:
+                    with get_conn() as conn:
+                        conn.execute("BEGIN IMMEDIATE")
+                        save_model_fields(conn, key, fields, weights, now)
+                else:
+                    WRITE_BEHIND.put(key, now, fields=fields, weights=weights)
+                    if weights:
+                        # The queue closes the spool once it has been written.
+                        stack.pop_all()
+            RESPONSE_CACHE.invalidate(key)
+            self._send_save_result(now)
+            return
+        if parsed.path.startswith("/api/rl-weights/"):
+            key = unquote(parsed.path.split("/api/rl-weights/")[1])
+            reader = self._body_reader()
+            if reader is None:
+                return
+            with ExitStack() as stack:
+                spool = stack.enter_context(
+                    tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+                )
+                # Spool first so a slow upload never holds the SQLite write lock.
+                hashing = HashingWriter(spool)
+                while True:
+                    chunk = reader.read()
+                    if not chunk:
+                        break
+                    hashing.write(chunk)
+                weights = (spool, hashing.hexdigest(), hashing.size)
+                now = datetime.utcnow().isoformat() + "Z"
+                if WRITE_BEHIND is None:
+                    with get_conn() as conn:
+                        conn.execute("BEGIN IMMEDIATE")
+                        found = save_weights(conn, key, weights, now)
+                else:
+                    found = WRITE_BEHIND.has_fields(key) or load_updated_at(key) is not None
+                    if found:
+                        WRITE_BEHIND.put(key, now, weights=weights)
+                        stack.pop_all()
+            RESPONSE_CACHE.invalidate(key)
+            if not found:
+                self._send_json(404, {"error": "Model not found"})
+                return
+            self._send_save_result(now)
+            return
+        self._send_text(404, "Not found")
+
+    def do_PATCH(self):
+        parsed = urlparse(self.path)
+        if parsed.path.startswith("/api/rl-weights/"):
+            key = unquote(parsed.path.split("/api/rl-weights/")[1])
+            if not self._flush_pending(key):
                 return
+            reader = self._body_reader()
+            if reader is None:
+                return
+            if_match = self.headers.get("If-Match")
             now = datetime.utcnow().isoformat() + "Z"
-            with sqlite3.connect(DB_PATH) as conn:
-                conn.execute(
-                    """
-                    INSERT INTO rl_models (
-                        model_key, model_json, weight_specs, weight_data_base64,
-                        training_config, metadata, updated_at
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(model_key) DO UPDATE SET
-                        model_json=excluded.model_json,
-                        weight_specs=excluded.weight_specs,
-                        weight_data_base64=excluded.weight_data_base64,
-                        training_config=excluded.training_config,
-                        metadata=excluded.metadata,
-                        updated_at=excluded.updated_at
-                    """,
-                    (
-                        key,
-                        json.dumps(model_topology),
-                        json.dumps(weight_specs),
-                        weight_data_base64,
-                        json.dumps(payload.get("trainingConfig"))
-                        if payload.get("trainingConfig") is not None
-                        else None,
-                        json.dumps(payload.get("userDefinedMetadata"))
-                        if payload.get("userDefinedMetadata") is not None
-                        else None,
-                        now,
-                    ),
+            error = None
+            with ExitStack() as stack:
+                # Spool the tensor data before taking the SQLite write lock,
+                # as the POST paths do, and build the result in a second spool.
+                data = stack.enter_context(
+                    tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+                )
+                try:
+                    tensors = read_weight_patch(reader, data)
+                except ValueError as exc:
+                    self._send_json(400, {"error": str(exc)})
+                    return
+                spool = stack.enter_context(
+                    tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
                 )
-                conn.commit()
+                with get_conn() as conn:
+                    # IMMEDIATE takes the write lock before reading, so the
+                    # read-modify-write cannot interleave with another save.
+                    conn.execute("BEGIN IMMEDIATE")
+                    row = conn.execute(
+                        """
+                        SELECT m.weight_specs, m.updated_at,
+                               b.data, b.in_file, m.weight_hash, b.size
+                        FROM rl_models AS m
+                        LEFT JOIN rl_weight_blobs AS b ON b.hash = m.weight_hash
+                        WHERE m.model_key = ?
+                        """,
+                        (key,),
+                    ).fetchone()
+                    if not row:
+                        error = (404, "Model not found")
+                    elif if_match and not etag_matches(
+                        if_match, model_etag(key, row[1], "weights")
+                    ):
+                        error = (412, "Model changed since If-Match version")
+                    else:
+                        hashing = HashingWriter(spool)
+                        try:
+                            with open_weight_blob(*row[2:]) as weight_data:
+                                apply_weight_patch(
+                                    weight_data, json.loads(row[0]), tensors, data, hashing
+                                )
+                        except ValueError as exc:
+                            error = (409, str(exc))
+                        else:
+                            digest = hashing.hexdigest()
+                            store_blob(conn, digest, hashing.size, spool, blob_target())
+                            conn.execute(
+                                """
+                                UPDATE rl_models SET weight_hash = ?, updated_at = ?
+                                WHERE model_key = ?
+                                """,
+                                (digest, now, key),
+                            )
+                            if row[4] != digest:
+                                release_blob(conn, row[4], weights_dir())
+                            record_version(conn, key)
+                            refresh_model_stats(conn, key)
+                            renew_lease(conn, key)
+            if error:
+                self._send_json(error[0], {"error": error[1]})
+                return
+            RESPONSE_CACHE.invalidate(key)
             self._send_json(200, {"ok": True, "updatedAt": now})
             return
         self._send_text(404, "Not found")
 
 
+class IdleConnections:
+    """Keep-alive sockets waiting for their next request.
+
+    A selector thread watches them and hands each one back to the pool once
+    it is readable; sockets idle past IDLE_TIMEOUT_SECONDS are closed.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.selector = selectors.DefaultSelector()
+        self.lock = threading.Lock()
+        self.parked = {}  # socket -> (client_address, idle deadline)
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.selector.register(self.wake_reader, selectors.EVENT_READ)
+        self.added = []
+        self.stopping = False
+        self.thread = threading.Thread(target=self._run, name="rl-idle", daemon=True)
+        self.thread.start()
+
+    def park(self, request, client_address):
+        with self.lock:
+            self.added.append((request, client_address))
+        self.wake_writer.send(b"\0")
+
+    def __len__(self):
+        with self.lock:
+            return len(self.parked) + len(self.added)
+
+    def evict_oldest(self):
+        """Close the longest-idle socket; False if none is parked"""
+        with self.lock:
+            if not self.parked:
+                return False
+            request = min(self.parked, key=lambda sock: self.parked[sock][1])
+            self.parked.pop(request)
+        self._discard(request)
+        return True
+
+    def close(self):
+        self.stopping = True
+        self.wake_writer.send(b"\0")
+        self.thread.join()
+        with self.lock:
+            requests = list(self.parked) + [request for request, _ in self.added]
+            self.parked.clear()
+            self.added.clear()
+        for request in requests:
+            self.server.close_client(request)
+        self.selector.close()
+        self.wake_reader.close()
+        self.wake_writer.close()
+
+    def _discard(self, request):
+        try:
+            self.selector.unregister(request)
+        except (KeyError, ValueError):
+            pass
+        self.server.close_client(request)
+
+    def _run(self):
+        while not self.stopping:
+            now = time.monotonic()
+            with self.lock:
+                added, self.added = self.added, []
+                for request, client_address in added:
+                    self.parked[request] = (client_address, now + IDLE_TIMEOUT_SECONDS)
+                    self.selector.register(request, selectors.EVENT_READ)
+                expired = [sock for sock, (_, deadline) in self.parked.items() if deadline <= now]
+                for request in expired:
+                    self.parked.pop(request)
+            for request in expired:
+                self._discard(request)
+            for key, _ in self.selector.select(timeout=1.0):
+                if key.fileobj is self.wake_reader:
+                    self.wake_reader.recv(4096)
+                    continue
+                with self.lock:
+                    entry = self.parked.pop(key.fileobj, None)
+                if entry is None:
+                    continue
+                self.selector.unregister(key.fileobj)
+                try:
+                    self.server.submit(key.fileobj, entry[0])
+                except RuntimeError:
+                    # The pool has shut down.
+                    self.server.close_client(key.fileobj)
+
+
+class PooledHTTPServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer that hands requests to a fixed-size thread pool.
+
+    Keep-alive connections only occupy a pool thread while a request is
+    being served; between requests they wait in IdleConnections.
+    """
+
+    # Default of 5 overflows when many workers connect at once.
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers):
+        super().__init__(server_address, handler_class)
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="rl-backend"
+        )
+        self.idle = IdleConnections(self)
+        self.open_connections = 0
+        self.connections_lock = threading.Lock()
+
+    def verify_request(self, request, client_address):
+        with self.connections_lock:
+            if self.open_connections < MAX_CONNECTIONS:
+                self.open_connections += 1
+                return True
+        if self.idle.evict_oldest():
+            with self.connections_lock:
+                self.open_connections += 1
+            return True
+        # Refused; the caller closes the socket without counting it.
+        return False
+
+    def process_request(self, request, client_address):
+        self.submit(request, client_address)
+
+    def submit(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        handler = None
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+        except Exception:
+            self.handle_error(request, client_address)
+        if handler is not None and handler.keep_alive and not self.idle.stopping:
+            self.idle.park(request, client_address)
+        else:
+            self.close_client(request)
+
+    def close_client(self, request):
+        with self.connections_lock:
+            self.open_connections -= 1
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        # Stop parking first so in-flight requests close their sockets.
+        self.idle.stopping = True
+        self.executor.shutdown(wait=True)
+        self.idle.close()
+
+
+def create_server(host=HOST, port=PORT, workers=WORKERS):
+    return PooledHTTPServer((host, port), Handler, max(workers, 1))
+
+
+def raise_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
 def main():
+    global WRITE_BEHIND
     init_db()
-    rebuild_free_list()
-    server = HTTPServer((HOST, PORT), Handler)
-    print(f"DeepRL backend listening on http://{HOST}:{PORT}")
-    server.serve_forever()
+    if WRITE_BEHIND_SECONDS > 0:
+        WRITE_BEHIND = WriteBehindQueue(
+            write_pending_saves, WRITE_BEHIND_SECONDS, WRITE_BEHIND_MAX_BYTES
+        )
+        WRITE_BEHIND.start()
+    # Treat SIGTERM like Ctrl+C so queued saves are flushed on the way out.
+    signal.signal(signal.SIGTERM, raise_interrupt)
+    server = create_server()
+    mode = f"{WORKERS} worker threads, keep-alive up to {MAX_CONNECTIONS} connections"
+    print(f"DeepRL backend listening on http://{HOST}:{PORT} ({mode})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if WRITE_BEHIND is not None:
+            WRITE_BEHIND.stop()
+        close_connections()
 
 
 if __name__ == "__main__":
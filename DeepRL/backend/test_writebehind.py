@@ -0,0 +1,125 @@
+"""
+Tests for the write-behind queue and the server paths that consult it.
+Run from this directory with: python -m unittest test_writebehind
+"""
+
+import http.client
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import server
+from writebehind import WriteBehindQueue
+
+
+class BlockingWriter:
+    """Writer that holds each batch until released, like a slow commit"""
+
+    def __init__(self, write=None):
+        self.write = write
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+
+    def __call__(self, batch):
+        self.started.set()
+        self.release.wait(5)
+        if self.write is not None:
+            self.write(batch)
+        self.batches.append(batch)
+
+
+class WriteBehindQueueTest(unittest.TestCase):
+    def test_fields_visible_while_batch_is_written(self):
+        writer = BlockingWriter()
+        queue = WriteBehindQueue(writer, interval=60, max_bytes=1 << 30)
+        queue.put("k", "t1", fields={"modelTopology": ("{}", {})})
+        flusher = threading.Thread(target=queue.flush)
+        flusher.start()
+        self.assertTrue(writer.started.wait(5))
+        self.assertTrue(queue.has_fields("k"))
+        writer.release.set()
+        flusher.join(5)
+        self.assertFalse(queue.has_fields("k"))
+        self.assertEqual(list(writer.batches[0]), ["k"])
+
+    def test_failed_batch_is_requeued(self):
+        def fail(batch):
+            raise RuntimeError("disk full")
+
+        queue = WriteBehindQueue(fail, interval=60, max_bytes=1 << 30)
+        queue.put("k", "t1", fields={"modelTopology": ("{}", {})})
+        with self.assertRaises(RuntimeError):
+            queue.flush()
+        self.assertTrue(queue.has_fields("k"))
+        self.assertEqual(queue.stats()["pendingKeys"], 1)
+
+
+class WeightUploadDuringFlushTest(unittest.TestCase):
+    """A weight POST that lands while its model POST is being written"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved = (server.DB_PATH, server.WRITE_BEHIND)
+        server.DB_PATH = os.path.join(self.tmp.name, "rl-models.db")
+        server.init_db()
+        self.writer = BlockingWriter(server.write_pending_saves)
+        server.WRITE_BEHIND = WriteBehindQueue(self.writer, interval=60, max_bytes=1 << 30)
+        server.Handler.log_message = lambda *args: None
+        self.http_server = server.create_server(port=0, workers=2)
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+        self.port = self.http_server.server_address[1]
+
+    def tearDown(self):
+        self.writer.release.set()
+        self.http_server.shutdown()
+        self.http_server.server_close()
+        server.WRITE_BEHIND.flush()
+        server.close_connections()
+        del server.Handler.log_message
+        server.DB_PATH, server.WRITE_BEHIND = self.saved
+        self.tmp.cleanup()
+
+    def request(self, method, path, body=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=10)
+        try:
+            conn.request(method, path, body=body)
+            response = conn.getresponse()
+            return response.status, response.read()
+        finally:
+            conn.close()
+
+    def test_weights_accepted_while_model_is_written(self):
+        model = {"modelTopology": {"layers": []}, "weightSpecs": [{"name": "w"}]}
+        status, _ = self.request("POST", "/api/rl-model/k", json.dumps(model))
+        self.assertEqual(status, 200)
+        flusher = threading.Thread(target=server.WRITE_BEHIND.flush)
+        flusher.start()
+        self.assertTrue(self.writer.started.wait(5))
+        status, body = self.request("POST", "/api/rl-weights/k", b"\x01\x02\x03\x04")
+        self.assertEqual(status, 200, body)
+        self.writer.release.set()
+        flusher.join(5)
+        status, body = self.request("GET", "/api/rl-weights/k")
+        self.assertEqual((status, body), (200, b"\x01\x02\x03\x04"))
+
+    def test_failed_flush_answers_503(self):
+        def fail(batch):
+            raise RuntimeError("database is locked")
+
+        model = {"modelTopology": {"layers": []}, "weightSpecs": [{"name": "w"}]}
+        status, _ = self.request("POST", "/api/rl-model/k", json.dumps(model))
+        self.assertEqual(status, 200)
+        server.WRITE_BEHIND.writer = fail
+        status, _ = self.request("GET", "/api/rl-model/k")
+        self.assertEqual(status, 503)
+        server.WRITE_BEHIND.writer = self.writer
+        self.writer.release.set()
+        status, _ = self.request("GET", "/api/rl-model/k?weights=0")
+        self.assertEqual(status, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
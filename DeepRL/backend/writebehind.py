@@ -0,0 +1,165 @@
+"""
+Write-behind queue for the DeepRL backend.
+Keeps only the latest unsaved state per model key and hands everything
+pending to a writer in one batch, on a timer or once enough bytes queue up.
+"""
+
+import sys
+import threading
+import traceback
+
+
+class PendingSave:
+    """Latest acknowledged, not yet written state of one model key.
+
+    fields holds the parsed JSON envelope of the last model POST and weights
+    the (spool, digest, size) of the last weight upload; either may be None.
+    """
+
+    def __init__(self):
+        self.fields = None
+        self.weights = None
+        self.updated_at = None
+
+    @property
+    def size(self):
+        return self.weights[2] if self.weights else 0
+
+    def close(self):
+        if self.weights:
+            self.weights[0].close()
+            self.weights = None
+
+
+class WriteBehindQueue:
+    """Coalesces saves per key and flushes them from a background thread"""
+
+    def __init__(self, writer, interval, max_bytes):
+        """
+        Args:
+            writer: Called with a {model_key: PendingSave} dict; must write all
+                of it in one transaction or raise
+            interval: Seconds between timed flushes
+            max_bytes: Queued weight bytes that trigger an early flush
+        """
+        self.writer = writer
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self._pending = {}
+        self._writing = {}  # batch handed to the writer and not yet committed
+        self._bytes = 0
+        self._lock = threading.Lock()  # guards _pending, _writing and _bytes
+        self._flush_lock = threading.Lock()  # one batch in flight at a time
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self.flushes = 0
+        self.coalesced = 0
+
+    def put(self, model_key, updated_at, fields=None, weights=None):
+        """Queue new fields and/or weights for model_key, replacing older ones"""
+        with self._lock:
+            entry = self._pending.get(model_key)
+            if entry is None:
+                entry = self._pending[model_key] = PendingSave()
+            else:
+                self.coalesced += 1
+            if fields is not None:
+                entry.fields = fields
+            if weights is not None:
+                self._bytes -= entry.size
+                entry.close()
+                entry.weights = weights
+                self._bytes += entry.size
+            entry.updated_at = updated_at
+            full = self._bytes >= self.max_bytes
+        if full:
+            self._wakeup.set()
+
+    def has_fields(self, model_key):
+        """Whether a model POST for model_key is queued or being written"""
+        with self._lock:
+            for entries in (self._pending, self._writing):
+                entry = entries.get(model_key)
+                if entry is not None and entry.fields is not None:
+                    return True
+            return False
+
+    def flush(self, model_key=None):
+        """Write pending saves (only model_key's if given) before returning"""
+        with self._flush_lock:
+            with self._lock:
+                if model_key is None:
+                    batch = self._pending
+                    self._pending = {}
+                elif model_key in self._pending:
+                    batch = {model_key: self._pending.pop(model_key)}
+                else:
+                    return
+                self._bytes -= sum(entry.size for entry in batch.values())
+                # Until the writer commits, the batch is in neither _pending
+                # nor the database; keep it visible to has_fields().
+                self._writing = batch
+            if not batch:
+                return
+            try:
+                self.writer(batch)
+            except Exception:
+                self._requeue(batch)
+                raise
+            finally:
+                with self._lock:
+                    self._writing = {}
+            self.flushes += 1
+            for entry in batch.values():
+                entry.close()
+
+    def _requeue(self, batch):
+        # Put a failed batch back underneath anything queued since.
+        with self._lock:
+            for model_key, entry in batch.items():
+                newer = self._pending.get(model_key)
+                if newer is None:
+                    self._pending[model_key] = entry
+                    self._bytes += entry.size
+                    continue
+                if newer.fields is None:
+                    newer.fields = entry.fields
+                if newer.weights is None:
+                    newer.weights = entry.weights
+                    self._bytes += entry.size
+                else:
+                    entry.close()
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="rl-write-behind", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread and write whatever is still queued"""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pendingKeys": len(self._pending),
+                "pendingBytes": self._bytes,
+                "flushes": self.flushes,
+                "coalesced": self.coalesced,
+            }
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # The batch was requeued; report and retry on the next tick.
+                traceback.print_exc(file=sys.stderr)
@@ -15,6 +15,7 @@ let baseModelStorageKey = '';
 let allocatedModelKey = '';
 let replay = [];
 let replayIndex = 0;
+let lastSavedWeights = null;
 const prevState = new Map();
 const prevAction = new Map();
 
@@ -24,43 +25,112 @@ const setupTf = async (tfjsUrl) => {
     tf = self.tf;
 };
 
-const arrayBufferToBase64 = (buffer) => {
-    const bytes = new Uint8Array(buffer);
-    let binary = '';
-    for (let i = 0; i < bytes.byteLength; i += 1) {
-        binary += String.fromCharCode(bytes[i]);
+const DTYPE_BYTES = {
+    float32: 4,
+    int32: 4,
+    bool: 1,
+    complex64: 8,
+    uint8: 1,
+    uint16: 2,
+    float16: 2
+};
+
+const toArrayBuffer = (weightData) => (
+    Array.isArray(weightData) ? tf.io.concatenateArrayBuffers(weightData) : weightData
+);
+
+const weightSlices = (weightSpecs, weightData) => {
+    const slices = [];
+    let offset = 0;
+    weightSpecs.forEach((spec) => {
+        const dtype = spec.quantization ? spec.quantization.dtype : spec.dtype;
+        const count = (spec.shape || []).reduce((acc, dim) => acc * dim, 1);
+        const length = count * (DTYPE_BYTES[dtype] || 4);
+        slices.push({ name: spec.name, bytes: new Uint8Array(weightData, offset, length) });
+        offset += length;
+    });
+    return slices;
+};
+
+const bytesEqual = (a, b) => {
+    if (a.length !== b.length) return false;
+    for (let i = 0; i < a.length; i += 1) {
+        if (a[i] !== b[i]) return false;
     }
-    return btoa(binary);
+    return true;
+};
+
+// Body for PATCH /api/rl-weights/: uint32 LE header length, JSON header, tensor data.
+const buildWeightPatch = (changed) => {
+    const header = new TextEncoder().encode(JSON.stringify({
+        tensors: changed.map(slice => ({ name: slice.name, mode: 'replace' }))
+    }));
+    const dataLength = changed.reduce((acc, slice) => acc + slice.bytes.length, 0);
+    const body = new Uint8Array(4 + header.length + dataLength);
+    new DataView(body.buffer).setUint32(0, header.length, true);
+    body.set(header, 4);
+    let offset = 4 + header.length;
+    changed.forEach((slice) => {
+        body.set(slice.bytes, offset);
+        offset += slice.bytes.length;
+    });
+    return body;
 };
 
-const base64ToArrayBuffer = (base64) => {
-    const binary = atob(base64);
-    const length = binary.length;
-    const bytes = new Uint8Array(length);
-    for (let i = 0; i < length; i += 1) {
-        bytes[i] = binary.charCodeAt(i);
+const uploadWeights = async (weightsUrl, weightSpecs, weightData) => {
+    const specsJson = JSON.stringify(weightSpecs);
+    const previous = lastSavedWeights;
+    if (previous && previous.key === config.modelStorageKey && previous.specsJson === specsJson) {
+        const before = weightSlices(weightSpecs, previous.weightData);
+        const changed = weightSlices(weightSpecs, weightData)
+            .filter((slice, index) => !bytesEqual(slice.bytes, before[index].bytes));
+        if (!changed.length) return true;
+        const response = await fetch(weightsUrl, {
+            method: 'PATCH',
+            headers: { 'Content-Type': 'application/octet-stream' },
+            body: buildWeightPatch(changed)
+        });
+        if (response.ok) {
+            lastSavedWeights = { ...previous, weightData: weightData.slice(0) };
+            return true;
+        }
+        // Fall back to a full upload if the stored weights diverged.
     }
-    return bytes.buffer;
+    const response = await fetch(weightsUrl, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/octet-stream' },
+        body: weightData
+    });
+    if (!response.ok) return false;
+    lastSavedWeights = { key: config.modelStorageKey, specsJson, weightData: weightData.slice(0) };
+    return true;
 };
 
 const saveToBackend = async () => {
     if (!backendUrl || !config.modelStorageKey) return;
+    const modelUrl = `${backendUrl}/api/rl-model/${encodeURIComponent(config.modelStorageKey)}`;
+    const weightsUrl = `${backendUrl}/api/rl-weights/${encodeURIComponent(config.modelStorageKey)}`;
     const handler = tf.io.withSaveHandler(async (artifacts) => {
         const payload = {
             modelTopology: artifacts.modelTopology,
             weightSpecs: artifacts.weightSpecs,
-            weightDataBase64: arrayBufferToBase64(artifacts.weightData),
             trainingConfig: artifacts.trainingConfig || null,
             userDefinedMetadata: {
                 ...(artifacts.userDefinedMetadata || {}),
-                mapKey: mapKey || null
+                mapKey: mapKey || null,
+                episodes,
+                steps,
+                loss: lastLoss
             }
         };
-        await fetch(`${backendUrl}/api/rl-model/${encodeURIComponent(config.modelStorageKey)}`, {
+        const response = await fetch(modelUrl, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify(payload)
         });
+        if (response.ok) {
+            await uploadWeights(weightsUrl, artifacts.weightSpecs, toArrayBuffer(artifacts.weightData));
+        }
         return { modelArtifactsInfo: artifacts.modelArtifactsInfo };
     });
     await model.save(handler);
@@ -68,16 +138,30 @@ const saveToBackend = async () => {
 
 const loadFromBackend = async () => {
     if (!backendUrl || !config.modelStorageKey) return false;
-    const response = await fetch(`${backendUrl}/api/rl-model/${encodeURIComponent(config.modelStorageKey)}`);
+    const modelUrl = `${backendUrl}/api/rl-model/${encodeURIComponent(config.modelStorageKey)}`;
+    const weightsUrl = `${backendUrl}/api/rl-weights/${encodeURIComponent(config.modelStorageKey)}`;
+    // The backend sends ETags with Cache-Control: no-cache, so the browser's HTTP
+    // cache keeps the last download and revalidates it (304) instead of
+    // re-downloading an unchanged model.
+    const response = await fetch(`${modelUrl}?weights=0`, { cache: 'no-cache' });
     if (!response.ok) return false;
     const payload = await response.json();
-    if (!payload || !payload.modelTopology || !payload.weightSpecs || !payload.weightDataBase64) {
+    if (!payload || !payload.modelTopology || !payload.weightSpecs) {
         return false;
     }
+    const weightsResponse = await fetch(weightsUrl, { cache: 'no-cache' });
+    if (!weightsResponse.ok) return false;
+    const weightData = await weightsResponse.arrayBuffer();
+    if (!weightData.byteLength) return false;
+    lastSavedWeights = {
+        key: config.modelStorageKey,
+        specsJson: JSON.stringify(payload.weightSpecs),
+        weightData: weightData.slice(0)
+    };
     const handler = tf.io.fromMemory({
         modelTopology: payload.modelTopology,
         weightSpecs: payload.weightSpecs,
-        weightData: base64ToArrayBuffer(payload.weightDataBase64),
+        weightData,
         trainingConfig: payload.trainingConfig || null,
         userDefinedMetadata: payload.userDefinedMetadata || null
     });
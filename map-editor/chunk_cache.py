@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Chunked Map Display Cache for Tank Arena Map Editor
+
+The canvas shows the map as CHUNK_SIZE x CHUNK_SIZE display-pixel images
+rather than one image of the whole (zoomed) map. Only chunks inside the
+viewport are rendered, and rendered chunks are kept in an LRU per zoom
+level, so memory and redraw time follow the window size, not the map size.
+"""
+
+import math
+from collections import OrderedDict
+
+# Chunk edge in display (zoomed) pixels
+CHUNK_SIZE = 256
+# A 256x256 RGBA chunk is 256 KB; a full-HD viewport needs about 40 chunks
+MAX_CHUNKS = 192
+
+
+def chunk_range(start, stop):
+    """Indices of the chunks covering display pixels [start, stop)"""
+    first = max(0, int(start) // CHUNK_SIZE)
+    last = (math.ceil(stop) - 1) // CHUNK_SIZE
+    return range(first, last + 1)
+
+
+class ChunkCache:
+    """LRU of rendered chunk images, grouped by zoom level"""
+
+    def __init__(self, max_chunks=MAX_CHUNKS):
+        self.max_chunks = max_chunks
+        self.levels = OrderedDict()  # zoom -> OrderedDict((chunk_row, chunk_col) -> image)
+        self.count = 0
+
+    def get(self, zoom, chunk_row, chunk_col, render):
+        """
+        Return the image of one chunk, calling render() to create it on a miss
+
+        Args:
+            zoom: Zoom level the chunk is displayed at
+            chunk_row, chunk_col: Chunk position in CHUNK_SIZE units
+            render: Callable returning the chunk image
+        """
+        level = self.levels.get(zoom)
+        if level is None:
+            level = self.levels[zoom] = OrderedDict()
+        self.levels.move_to_end(zoom)
+        key = (chunk_row, chunk_col)
+        image = level.get(key)
+        if image is not None:
+            level.move_to_end(key)
+            return image
+        image = level[key] = render()
+        self.count += 1
+        self._evict()
+        return image
+
+    def prefetch(self, zoom, chunk_row, chunk_col, render):
+        """
+        Render a chunk ahead of need if the cache has room for it
+
+        Unlike get(), this never evicts and does not make the zoom level more
+        recent than the one being viewed.
+
+        Returns:
+            False if the cache is full, True otherwise
+        """
+        level = self.levels.get(zoom)
+        if level is not None and (chunk_row, chunk_col) in level:
+            return True
+        if self.count >= self.max_chunks:
+            return False
+        if level is None:
+            level = self.levels[zoom] = OrderedDict()
+            self.levels.move_to_end(zoom, last=False)
+        level[(chunk_row, chunk_col)] = render()
+        self.count += 1
+        return True
+
+    def invalidate(self, x0, y0, x1, y1):
+        """Drop chunks at every zoom level that show map pixels [x0, x1) x [y0, y1)"""
+        for zoom, level in self.levels.items():
+            rows = chunk_range(y0 * zoom, y1 * zoom)
+            cols = chunk_range(x0 * zoom, x1 * zoom)
+            stale = [key for key in level if key[0] in rows and key[1] in cols]
+            for key in stale:
+                del level[key]
+            self.count -= len(stale)
+
+    def clear(self):
+        self.levels.clear()
+        self.count = 0
+
+    def _evict(self):
+        # Least recently used zoom levels are emptied first, so the level
+        # being viewed only loses chunks once it alone exceeds the budget.
+        while self.count > self.max_chunks:
+            zoom, level = next(iter(self.levels.items()))
+            level.popitem(last=False)
+            self.count -= 1
+            if not level:
+                del self.levels[zoom]
@@ -14,6 +14,12 @@ from tile_definitions import (
     is_accessible, is_destructible, blocks_bullet,
     get_tile_color, get_tile_name, validate_tile_id
 )
+from tile_grid import (
+    new_grid, grid_from_list, grid_to_list, count_tile, clip_rect, fill_rect, diff_grids
+)
+from map_render import build_texture_atlas
+from chunk_cache import CHUNK_SIZE, chunk_range
+from zoom_pyramid import ZoomPyramid, zoom_levels
 
 
 class MapEditor:
@@ -25,18 +31,16 @@ class MapEditor:
         # Map data (map_size is pixels, tile_count is tiles)
         self.map_size = 512
         self.tile_count = self.map_size // TILE_SIZE
-        self.tiles = []
+        self.tiles = new_grid(0)  # uint8 array indexed [row, col]
         self.selected_tile = 0
         self.selection_start = None
         self.selection_end = None
         self.is_selecting = False
         
-        # Cached map image for fast rendering
-        self.map_image = None
-        self.map_image_id = None
-        self.map_image_pil = None
-        self.map_image_zoomed = None
-        self.map_image_zoom = 1.0
+        # The map is shown on the canvas as chunk images from self.zoom_pyramid
+        self.zoom_pyramid = None
+        self.chunk_items = {}  # (chunk_row, chunk_col) -> (canvas item, image) on screen
+        self.chunk_items_zoom = None
         self.image_cache_dirty = True
         self.editing_area_size = 100  # Size of editing area in tiles
         self.current_editing_center = None  # Center of current editing area
@@ -45,6 +49,10 @@ class MapEditor:
         self.zoom = 1.0
         self.zoom_min = 0.25
         self.zoom_max = 4.0
+        self.zoom_levels = zoom_levels(self.zoom_min, self.zoom_max)
+        self.zoom_index = self.zoom_levels.index(1.0)
+        self.prefetch_queue = []  # (zoom, chunk_row, chunk_col) to render while idle
+        self.prefetch_job = None
         self.spawn_limits = {
             6: 2,  # Player Tank Spawn
             5: 4,  # AI Tank Spawn
@@ -52,11 +60,12 @@ class MapEditor:
         }
         self.tile_textures = {}
         self.tile_textures_tk = {}
-        self.tile_textures_zoomed = {}
+        self.texture_atlas = build_texture_atlas({})  # Textures stacked by tile ID
+        self.tile_textures_zoomed = {}  # (tile_id, zoom level) -> PhotoImage
         self.tile_palette_images = {}
         self.undo_stack = []
         self.redo_stack = []
-        self.current_action = None
+        self.current_action = None  # Copy of self.tiles taken when an edit begins
         
         # Statistics panel
         self.stats_panel = None
@@ -68,6 +77,7 @@ class MapEditor:
         self.create_toolbar()
         self.create_canvas()
         self.load_tile_textures()
+        self.zoom_pyramid = ZoomPyramid(self.texture_atlas, self.zoom_levels)
         self.create_palette()
         self.create_statistics_panel()
         
@@ -184,8 +194,8 @@ class MapEditor:
                                  xscrollcommand=h_scrollbar.set)
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
-        v_scrollbar.config(command=self.canvas.yview)
-        h_scrollbar.config(command=self.canvas.xview)
+        v_scrollbar.config(command=lambda *args: self.on_scrollbar(self.canvas.yview, *args))
+        h_scrollbar.config(command=lambda *args: self.on_scrollbar(self.canvas.xview, *args))
         
         # Canvas events
         self.canvas.bind("<Button-1>", self.on_canvas_click)
@@ -288,6 +298,9 @@ class MapEditor:
             self.tile_textures_tk[tile_id] = ImageTk.PhotoImage(img)
             palette_img = img.resize((30, 30), resample=Image.NEAREST)
             self.tile_palette_images[tile_id] = ImageTk.PhotoImage(palette_img)
+        self.texture_atlas = build_texture_atlas(self.tile_textures)
+        if self.zoom_pyramid is not None:
+            self.zoom_pyramid.set_atlas(self.texture_atlas)
     
     def create_statistics_panel(self):
         """Create the statistics panel for displaying timer costs"""
@@ -445,7 +458,7 @@ class MapEditor:
         if self.map_size % TILE_SIZE != 0:
             raise ValueError("map_size must be divisible by TILE_SIZE")
         self.tile_count = self.map_size // TILE_SIZE
-        self.tiles = [[0 for _ in range(self.tile_count)] for _ in range(self.tile_count)]
+        self.tiles = new_grid(self.tile_count)
         self.size_var.set(str(size))
         
         # Reset scroll position
@@ -460,8 +473,7 @@ class MapEditor:
         
         # Mark cache as dirty and regenerate
         self.image_cache_dirty = True
-        self.map_image = None
-        self.map_image_id = None
+        self.dirty_tile_list.clear()  # Edits to the old map; redraw everything
         self.edited_region = None  # Reset edited region for full regeneration
         
         self.update_map_image_cache()
@@ -475,304 +487,26 @@ class MapEditor:
     def clear_map(self):
         if messagebox.askyesno("Clear Map", "Are you sure you want to clear the entire map?"):
             self.begin_action()
-            for row in range(self.tile_count):
-                for col in range(self.tile_count):
-                    if self.tiles[row][col] != 0:
-                        self.record_change(row, col, self.tiles[row][col])
-                        self.tiles[row][col] = 0
-                        self.dirty_tile_list.add((row, col))
+            rows, cols = fill_rect(self.tiles, 0, self.tile_count - 1, 0, self.tile_count - 1, 0)
+            self.dirty_tile_list.update(zip(rows.tolist(), cols.tolist()))
             self.end_action()
             self.edited_region = None  # Reset edited region for full regeneration
             self.image_cache_dirty = True
             self.needs_redraw = True
 
     def count_tiles(self, tile_id):
-        return sum(row.count(tile_id) for row in self.tiles)
+        return count_tile(self.tiles, tile_id)
 
     def can_place_tile(self, row, col, tile_id):
         limit = self.spawn_limits.get(tile_id)
         if limit is None:
             return True
         current = self.count_tiles(tile_id)
-        existing = self.tiles[row][col]
+        existing = self.tiles[row, col]
         if existing == tile_id:
             return True
         return current < limit
     
-    def generate_map_image(self, region=None):
-        """
-        Generate a cached image of the entire map or update a specific region
-        
-        Args:
-            region: Optional tuple (min_row, max_row, min_col, max_col) to update only a region.
-                   If None, generates the entire map.
-        """
-        with profile_time("generate_map_image", verbose=True, tag="cache"):
-            if self.map_size == 0:
-                return None
-
-            if self.tile_textures:
-                textured = self.generate_textured_map_image()
-                if textured is not None:
-                    return textured
-            
-            # Create PhotoImage for the map (map_size is in pixels)
-            img_width = self.map_size
-            img_height = self.map_size
-            
-            # If updating a region and image exists, use existing image, otherwise create new
-            if region is not None and self.map_image is not None:
-                # Check if existing image supports put() (native PhotoImage does, PIL ImageTk.PhotoImage doesn't)
-                if hasattr(self.map_image, 'put'):
-                    img = self.map_image
-                else:
-                    # PIL image doesn't support put(), need to create new native PhotoImage for full regeneration
-                    with profile_time("generate_map_image.create_image", verbose=False):
-                        img = tk.PhotoImage(width=img_width, height=img_height)
-                    # Treat as full image generation since PIL image can't be updated in place
-                    region = None
-                min_row, max_row, min_col, max_col = region if region else (0, self.tile_count - 1, 0, self.tile_count - 1)
-            else:
-                with profile_time("generate_map_image.create_image", verbose=False):
-                    # Create placeholder image (will be replaced if using PIL optimization)
-                    img = tk.PhotoImage(width=img_width, height=img_height)
-                min_row, max_row, min_col, max_col = 0, self.tile_count - 1, 0, self.tile_count - 1
-            
-            # Build pixel data row by row for better performance
-            # Process in chunks to show progress for large maps
-            chunk_size = max(100, self.tile_count // 10)  # Process 10% at a time or 100 rows
-            
-            total_pixels = 0
-            # Pre-cache tile colors
-            tile_colors_cache = [TILE_TYPES[i]["color"] for i in range(len(TILE_TYPES))]
-            num_rows = max_row - min_row + 1
-            num_cols = max_col - min_col + 1
-            tiles_data = self.tiles  # Cache reference
-            
-            # OPTIMIZATION: Check for uniform tiles early (before building strings)
-            is_uniform = False
-            uniform_tile_id = None
-            if num_rows * num_cols > 1000000 and region is None:
-                # Quick uniform check for large full images (sample corners + center)
-                first_tile = tiles_data[min_row][min_col]
-                center_row = (min_row + max_row) // 2
-                center_col = (min_col + max_col) // 2
-                is_uniform = (tiles_data[min_row][max_col] == first_tile and 
-                            tiles_data[max_row][min_col] == first_tile and
-                            tiles_data[max_row][max_col] == first_tile and
-                            tiles_data[center_row][center_col] == first_tile)
-                if is_uniform:
-                    uniform_tile_id = first_tile
-            
-            with profile_time("generate_map_image.fill_pixels", verbose=False, tag="cache"):
-                # OPTIMIZATION: For very large uniform images, use PIL fast path
-                if is_uniform and num_rows * num_cols > 1000000 and region is None:
-                    try:
-                        from PIL import Image, ImageTk
-                        # Ultra-fast path: single color for entire image
-                        uniform_color_hex = tile_colors_cache[uniform_tile_id]
-                        uniform_rgb = tuple(int(uniform_color_hex[i:i+2], 16) for i in (1, 3, 5))
-                        # Create image with uniform color (instant - no pixel iteration needed)
-                        pil_img = Image.new('RGB', (img_width, img_height), color=uniform_rgb)
-                        self.map_image_pil = pil_img
-                        self.map_image_zoomed = None
-                        img = ImageTk.PhotoImage(pil_img)
-                        total_pixels = num_rows * num_cols
-                        # Early return - skip all string building
-                        return img
-                    except ImportError:
-                        # PIL not available, fall through to standard path
-                        is_uniform = False
-                
-                if not (is_uniform and num_rows * num_cols > 1000000):
-                    # Standard path: build row strings or use PIL for non-uniform large images
-                    with profile_time("generate_map_image.build_row_strings", verbose=False, tag="cache"):
-                        row_strings = []
-                        
-                        if CANVAS_SCALE == 1:
-                            row_strings_append = row_strings.append
-                            for row_idx in range(min_row, max_row + 1):
-                                row_data = tiles_data[row_idx]
-                                row_str = "{" + " ".join(tile_colors_cache[row_data[col]] for col in range(min_col, max_col + 1)) + "}"
-                                row_strings_append(row_str)
-                                total_pixels += num_cols
-                        else:
-                            # For CANVAS_SCALE > 1
-                            row_strings_extend = row_strings.extend
-                            for row_idx in range(min_row, max_row + 1):
-                                row_data = tiles_data[row_idx]
-                                row_colors = []
-                                row_colors_extend = row_colors.extend
-                                for col in range(min_col, max_col + 1):
-                                    color = tile_colors_cache[row_data[col]]
-                                    row_colors_extend([color] * CANVAS_SCALE)
-                                    total_pixels += CANVAS_SCALE
-                                row_str = "{" + " ".join(row_colors) + "}"
-                                row_strings_extend([row_str] * CANVAS_SCALE)
-                
-                # Apply rows using put() with region bounds if updating a region
-                # Skip if we already created image using PIL uniform fast path
-                if not (is_uniform and num_rows * num_cols > 1000000 and region is None):
-                    with profile_time("generate_map_image.put_rows", verbose=False, tag="cache"):
-                        try:
-                            if region is not None and self.map_image is not None:
-                                # Update only the specific region using 'to' parameter
-                                # NOTE: For region updates, we must use native PhotoImage (not PIL)
-                                # because PIL's ImageTk.PhotoImage doesn't support put() method
-                                
-                                # Check if self.map_image supports put() method (native PhotoImage does, PIL ImageTk.PhotoImage doesn't)
-                                if not hasattr(self.map_image, 'put'):
-                                    # PIL ImageTk.PhotoImage doesn't support put(), so we need to regenerate the full image
-                                    # Fall through to full image generation below
-                                    pass
-                                else:
-                                    # Native PhotoImage supports put(), so we can update just the region
-                                    # Calculate pixel coordinates for the region
-                                    x1 = min_col * CANVAS_SCALE
-                                    y1 = min_row * CANVAS_SCALE
-                                    x2 = (max_col + 1) * CANVAS_SCALE
-                                    y2 = (max_row + 1) * CANVAS_SCALE
-                                    
-                                    # OPTIMIZATION: Use efficient string join (Python's join is already optimized)
-                                    # Join all rows with spaces: "{row1} {row2} {row3} ..."
-                                    data_string = " ".join(row_strings)
-                                    # Update only the specified region on the existing native PhotoImage
-                                    self.map_image.put(data_string, to=(x1, y1, x2, y2))
-                                    # Return the existing image (not a new one)
-                                    return self.map_image
-                            
-                            # Full image generation (either no region update, or PIL image that doesn't support put())
-                            # If we reach here, we need to generate a full image (either no region, or PIL image detected)
-                            # OPTIMIZATION: For very large images, try using PIL for faster rendering
-                            # Check if we should use PIL optimization (for maps > 1M pixels)
-                            if num_rows * num_cols > 1000000:
-                                try:
-                                    from PIL import Image, ImageTk
-                                    # OPTIMIZATION: Fast path for uniform tiles using PIL
-                                    first_tile = tiles_data[min_row][min_col]
-                                    # Quick uniform check (sample corners)
-                                    is_uniform = (tiles_data[min_row][max_col] == first_tile and 
-                                                tiles_data[max_row][min_col] == first_tile and
-                                                tiles_data[max_row][max_col] == first_tile)
-                                    
-                                    if is_uniform:
-                                        # Ultra-fast path: single color for entire image
-                                        uniform_color_hex = tile_colors_cache[first_tile]
-                                        uniform_rgb = tuple(int(uniform_color_hex[i:i+2], 16) for i in (1, 3, 5))
-                                        # Create image with uniform color (instant)
-                                        pil_img = Image.new('RGB', (img_width, img_height), color=uniform_rgb)
-                                    else:
-                                        # Pre-cache hex to RGB conversions
-                                        hex_to_rgb_cache = {}
-                                        for color_hex in tile_colors_cache:
-                                            hex_to_rgb_cache[color_hex] = tuple(int(color_hex[i:i+2], 16) for i in (1, 3, 5))
-                                        
-                                        # OPTIMIZATION: Use list comprehension for faster pixel data building
-                                        pixel_data = [
-                                            hex_to_rgb_cache[tile_colors_cache[tiles_data[row_idx][col_idx]]]
-                                            for row_idx in range(min_row, max_row + 1)
-                                            for col_idx in range(min_col, max_col + 1)
-                                        ]
-                                        
-                                        # Create PIL image and set all pixels at once
-                                        pil_img = Image.new('RGB', (img_width, img_height))
-                                        pil_img.putdata(pixel_data)
-                                    
-                                    self.map_image_pil = pil_img
-                                    self.map_image_zoomed = None
-                                    # Convert to PhotoImage
-                                    img = ImageTk.PhotoImage(pil_img)
-                                except ImportError:
-                                    # Fallback to standard PhotoImage.put() method
-                                    data_string = " ".join(row_strings)
-                                    # img is already a native PhotoImage from line 422, so put() will work
-                                    img.put(data_string)
-                            else:
-                                # Standard method for smaller images
-                                # img is already a native PhotoImage from line 422, so put() will work
-                                data_string = " ".join(row_strings)
-                                img.put(data_string)
-                        except Exception as e:
-                            # Fallback to individual pixel setting if batch format fails
-                            import traceback
-                            error_msg = f"Warning: Batch put() failed ({type(e).__name__}: {e}), falling back to individual pixels"
-                            print(error_msg)
-                            print(traceback.format_exc())
-                            # Fallback: set pixels individually (slower but works)
-                            # NOTE: For fallback, we must use native PhotoImage, not PIL
-                            if region is not None and self.map_image is not None and hasattr(self.map_image, 'put'):
-                                # Use existing native PhotoImage for region updates (only if it supports put())
-                                fallback_img = self.map_image
-                            else:
-                                # Use the native PhotoImage we created earlier, or regenerate full image
-                                if 'img' in locals() and hasattr(img, 'put'):
-                                    fallback_img = img
-                                else:
-                                    # Need to create a new native PhotoImage for fallback
-                                    fallback_img = tk.PhotoImage(width=img_width, height=img_height)
-                            total_pixels = 0
-                            for row in range(min_row * CANVAS_SCALE, (max_row + 1) * CANVAS_SCALE):
-                                for col in range(min_col * CANVAS_SCALE, (max_col + 1) * CANVAS_SCALE):
-                                    tile_row = row // CANVAS_SCALE
-                                    tile_col = col // CANVAS_SCALE
-                                    if 0 <= tile_row < self.tile_count and 0 <= tile_col < self.tile_count:
-                                        tile_id = self.tiles[tile_row][tile_col]
-                                        tile_info = TILE_TYPES[tile_id]
-                                        color = tile_info["color"]
-                                        fallback_img.put(color, (col, row))
-                                        total_pixels += 1
-                                if row % 100 == 0:
-                                    self.root.update_idletasks()
-                            # Return the fallback image (will be used as new full image if PIL was detected)
-                            return fallback_img
-            
-            # Log detailed performance breakdown for large maps
-            if self.map_size >= 1024:
-                fill_stats = TimeProfiler.get_stats("generate_map_image.fill_pixels")
-                build_rows_stats = TimeProfiler.get_stats("generate_map_image.build_row_strings")
-                put_rows_stats = TimeProfiler.get_stats("generate_map_image.put_rows")
-                
-                if fill_stats:
-                    pixels_per_ms = total_pixels / (fill_stats['total'] * 1000) if fill_stats['total'] > 0 else 0
-                    print(f"\n[PROFILE] Image Generation Performance:")
-                    print(f"[PROFILE]   Total pixels: {total_pixels:,}")
-                    print(f"[PROFILE]   Total time: {fill_stats['total']*1000:.2f}ms")
-                    print(f"[PROFILE]   Rate: {pixels_per_ms:.0f} pixels/ms")
-                    
-                    if build_rows_stats:
-                        pct = (build_rows_stats['total'] / fill_stats['total'] * 100) if fill_stats['total'] > 0 else 0
-                        print(f"[PROFILE]   Build row strings: {build_rows_stats['total']*1000:.2f}ms ({pct:.1f}%)")
-                    if put_rows_stats:
-                        pct = (put_rows_stats['total'] / fill_stats['total'] * 100) if fill_stats['total'] > 0 else 0
-                        print(f"[PROFILE]   Put rows: {put_rows_stats['total']*1000:.2f}ms ({pct:.1f}%)")
-                    print()
-            
-            return img
-
-    def generate_textured_map_image(self):
-        """Generate map image using tile textures."""
-        try:
-            from PIL import Image, ImageTk
-        except ImportError:
-            return None
-        img_width = self.map_size
-        img_height = self.map_size
-        pil_img = Image.new("RGBA", (img_width, img_height))
-        tile_cache = self.tile_textures
-        for row in range(self.tile_count):
-            y = row * TILE_SIZE
-            row_data = self.tiles[row]
-            for col in range(self.tile_count):
-                tile_id = row_data[col]
-                texture = tile_cache.get(tile_id)
-                if texture is None:
-                    color_hex = TILE_TYPES[tile_id]["color"]
-                    color_rgb = tuple(int(color_hex[i:i+2], 16) for i in (1, 3, 5))
-                    texture = Image.new("RGBA", (TILE_SIZE, TILE_SIZE), color=color_rgb)
-                pil_img.paste(texture, (col * TILE_SIZE, y))
-        self.map_image_zoomed = None
-        return ImageTk.PhotoImage(pil_img)
-    
     def update_map_image_cache(self):
         """Update the cached map image (call after editing is complete)"""
         with profile_time("update_map_image_cache", verbose=True, tag="cache"):
@@ -781,10 +515,8 @@ class MapEditor:
                 self.root.update()
                 
                 with profile_time("update_map_image_cache.generate", verbose=False, tag="cache"):
-                    used_region_update = False
-                    # If we have dirty tiles and existing image, update only that region
-                    if self.dirty_tile_list and self.map_image is not None:
-                        used_region_update = True
+                    # With dirty tiles, re-render only the chunks showing them
+                    if self.dirty_tile_list:
                         rows = [pos[0] for pos in self.dirty_tile_list]
                         cols = [pos[1] for pos in self.dirty_tile_list]
                         min_row, max_row = min(rows), max(rows)
@@ -794,51 +526,30 @@ class MapEditor:
                         max_row = min(self.tile_count - 1, max_row + 1)
                         min_col = max(0, min_col - 1)
                         max_col = min(self.tile_count - 1, max_col + 1)
-                        result_img = self.generate_map_image(region=(min_row, max_row, min_col, max_col))
-                        # If a new image was created (e.g. PIL path), keep it
-                        if result_img is not None and result_img is not self.map_image:
-                            self.map_image = result_img
+                        # Every zoom level drops its chunks over the region
+                        self.zoom_pyramid.invalidate_tiles(min_row, max_row, min_col, max_col)
                     else:
                         # Full regeneration
-                        self.map_image = self.generate_map_image()
+                        self.zoom_pyramid.clear()
                 
                 self.image_cache_dirty = False
                 self.edited_region = None  # Clear edited region after update
                 self.dirty_tile_list.clear()
-                self.map_image_zoomed = None
 
                 self.root.title("Tank Arena Map Editor")
-                
-                # Print detailed stats for large maps
-                if self.map_size >= 1024:
-                    cache_stats = TimeProfiler.get_stats("update_map_image_cache")
-                    gen_stats = TimeProfiler.get_stats("generate_map_image")
-                    if cache_stats and gen_stats:
-                        print(f"[PROFILE] Cache update breakdown:")
-                        print(f"  Total cache update: {cache_stats['total']*1000:.2f}ms")
-                        print(f"  Image generation:   {gen_stats['total']*1000:.2f}ms")
-                        print(f"  Overhead:            {(cache_stats['total'] - gen_stats['total'])*1000:.2f}ms")
     
     def draw_map(self):
-        """Draw map using cached background image"""
-        self.canvas.delete("all")
+        """Draw the visible map chunks, pending tile edits and the selection"""
+        self.canvas.delete("dynamic_tile")
         
-        # Update cached image only when redraw is requested
+        # Update cached pixels only when redraw is requested
         if self.needs_redraw:
             if self.image_cache_dirty:
                 self.update_map_image_cache()
             self.needs_redraw = False
         
-        # Draw cached background image
-        display_image = self.map_image
-        if self.zoom != 1.0:
-            display_image = self.get_zoomed_map_image()
-        if display_image:
-            if self.map_image_id:
-                self.canvas.delete(self.map_image_id)
-            self.map_image_id = self.canvas.create_image(0, 0, anchor=tk.NW, image=display_image, tags="background")
-        else:
-            pass
+        # Draw cached background chunks
+        self.draw_visible_chunks()
         
         # Get visible area and mouse position for editing area
         canvas_width = self.canvas.winfo_width()
@@ -865,7 +576,7 @@ class MapEditor:
         if self.dirty_tile_list:
             scale = CANVAS_SCALE * self.zoom
             for row, col in self.dirty_tile_list:
-                tile_id = self.tiles[row][col]
+                tile_id = int(self.tiles[row, col])
                 x1 = col * scale
                 y1 = row * scale
                 x2 = x1 + scale
@@ -896,6 +607,90 @@ class MapEditor:
         self.canvas.bind_all("<Button-4>", self.on_scroll)  # Linux
         self.canvas.bind_all("<Button-5>", self.on_scroll)  # Linux
     
+    def draw_visible_chunks(self):
+        """Show the chunks intersecting the viewport, rendering any not cached"""
+        if self.tiles.size == 0:
+            return
+        with profile_time("draw_visible_chunks", verbose=False, tag="render"):
+            if self.chunk_items_zoom != self.zoom:
+                # Every chunk moves and changes size with the zoom
+                self.canvas.delete("chunk")
+                self.chunk_items.clear()
+                self.chunk_items_zoom = self.zoom
+            display_size = self.map_size * self.zoom
+            width = self.canvas.winfo_width()
+            height = self.canvas.winfo_height()
+            if width <= 1 or height <= 1:
+                width = height = display_size
+            left = self.canvas.canvasx(0)
+            top = self.canvas.canvasy(0)
+            rows = chunk_range(top, min(top + height, display_size))
+            cols = chunk_range(left, min(left + width, display_size))
+            visible = set()
+            for chunk_row in rows:
+                for chunk_col in cols:
+                    key = (chunk_row, chunk_col)
+                    visible.add(key)
+                    image = self.zoom_pyramid.chunk(self.tiles, self.zoom, chunk_row, chunk_col)
+                    shown = self.chunk_items.get(key)
+                    if shown is None:
+                        item = self.canvas.create_image(
+                            chunk_col * CHUNK_SIZE, chunk_row * CHUNK_SIZE,
+                            anchor=tk.NW, image=image, tags="chunk"
+                        )
+                    else:
+                        item = shown[0]
+                        if shown[1] is not image:
+                            self.canvas.itemconfig(item, image=image)
+                    # Holding the image keeps Tk from freeing it if the cache evicts it
+                    self.chunk_items[key] = (item, image)
+            for key in [key for key in self.chunk_items if key not in visible]:
+                self.canvas.delete(self.chunk_items.pop(key)[0])
+            self.canvas.tag_lower("chunk")
+        self.queue_prefetch()
+
+    def queue_prefetch(self):
+        """
+        Queue the chunks the neighbouring zoom levels would show, to be
+        rendered while idle so that the next Ctrl + wheel step is instant
+        """
+        self.prefetch_queue = []
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width <= 1 or height <= 1 or self.tiles.size == 0:
+            return
+        # Viewport center in zoom 1 map pixels
+        center_x = (self.canvas.canvasx(0) + width / 2) / self.zoom
+        center_y = (self.canvas.canvasy(0) + height / 2) / self.zoom
+        for index in (self.zoom_index - 1, self.zoom_index + 1):
+            if not 0 <= index < len(self.zoom_levels):
+                continue
+            zoom = self.zoom_levels[index]
+            display_size = self.map_size * zoom
+            left = center_x * zoom - width / 2
+            top = center_y * zoom - height / 2
+            rows = chunk_range(max(0, top), min(top + height, display_size))
+            cols = chunk_range(max(0, left), min(left + width, display_size))
+            self.prefetch_queue.extend((zoom, row, col) for row in rows for col in cols)
+        if self.prefetch_queue and self.prefetch_job is None:
+            self.prefetch_job = self.root.after_idle(self.prefetch_chunks)
+
+    def prefetch_chunks(self):
+        """Render a few queued chunks, then yield back to the event loop"""
+        self.prefetch_job = None
+        for _ in range(4):
+            if not self.prefetch_queue:
+                return
+            zoom, chunk_row, chunk_col = self.prefetch_queue.pop()
+            if max(chunk_row, chunk_col) * CHUNK_SIZE >= self.map_size * zoom:
+                continue  # Queued before the map was replaced by a smaller one
+            if not self.zoom_pyramid.prefetch(self.tiles, zoom, chunk_row, chunk_col):
+                # Cache full: keep what is on screen rather than evict for guesses
+                self.prefetch_queue = []
+                return
+        if self.prefetch_queue:
+            self.prefetch_job = self.root.after_idle(self.prefetch_chunks)
+
     def draw_selection(self):
         if not self.selection_start or not self.selection_end:
             return
@@ -936,7 +731,7 @@ class MapEditor:
                 self.is_selecting = True
             else:
                 # Place single tile
-                if self.tiles[row][col] == self.selected_tile:
+                if self.tiles[row, col] == self.selected_tile:
                     return
                 if not self.can_place_tile(row, col, self.selected_tile):
                     messagebox.showwarning(
@@ -945,8 +740,7 @@ class MapEditor:
                     )
                     return
                 self.begin_action()
-                self.record_change(row, col, self.tiles[row][col])
-                self.tiles[row][col] = self.selected_tile
+                self.tiles[row, col] = self.selected_tile
                 # Store last click for verification
                 self._last_click = (col, row, self.selected_tile)
                 self.draw_tile(row, col)
@@ -973,13 +767,12 @@ class MapEditor:
                 )
             else:
                 # Place tiles while dragging
-                if self.tiles[row][col] == self.selected_tile:
+                if self.tiles[row, col] == self.selected_tile:
                     return
                 if not self.can_place_tile(row, col, self.selected_tile):
                     return
                 self.begin_action()
-                self.record_change(row, col, self.tiles[row][col])
-                self.tiles[row][col] = self.selected_tile
+                self.tiles[row, col] = self.selected_tile
                 self.draw_tile(row, col)
                 # Track edited region
                 self.dirty_tile_list.add((row, col))
@@ -994,7 +787,7 @@ class MapEditor:
     def on_canvas_motion(self, event):
         col, row = self.canvas_to_tile(event.x, event.y)
         if 0 <= row < self.tile_count and 0 <= col < self.tile_count:
-            tile_id = self.tiles[row][col]
+            tile_id = int(self.tiles[row, col])
             tile_info = TILE_TYPES[tile_id]
             self.root.title(f"Tank Arena Map Editor - Tile: {tile_info['name']} ({col}, {row})")
             
@@ -1024,8 +817,7 @@ class MapEditor:
             delta = 0
         
         if ctrl_down:
-            zoom_factor = 1.1 if delta > 0 else 1 / 1.1
-            self.apply_zoom(zoom_factor, event)
+            self.apply_zoom(1 if delta > 0 else -1, event)
             return
         
         # Scroll horizontally when Shift is held, otherwise vertical
@@ -1040,16 +832,23 @@ class MapEditor:
             self.needs_redraw = True
             self.root.after(50, self.redraw_after_scroll)
 
-    def apply_zoom(self, factor, event):
-        """Apply zoom centered at mouse position."""
-        new_zoom = max(self.zoom_min, min(self.zoom_max, self.zoom * factor))
-        if new_zoom == self.zoom:
+    def on_scrollbar(self, view, *args):
+        """Scroll from a scrollbar and draw the chunks that come into view"""
+        view(*args)
+        self.needs_redraw = True
+
+    def apply_zoom(self, steps, event):
+        """Move steps zoom levels in or out, centered at mouse position."""
+        new_index = max(0, min(len(self.zoom_levels) - 1, self.zoom_index + steps))
+        if new_index == self.zoom_index:
             return
+        new_zoom = self.zoom_levels[new_index]
         old_zoom = self.zoom
         canvas_x = self.canvas.canvasx(event.x)
         canvas_y = self.canvas.canvasy(event.y)
         map_x = canvas_x / old_zoom
         map_y = canvas_y / old_zoom
+        self.zoom_index = new_index
         self.zoom = new_zoom
         # Update scroll region
         scroll_region = (0, 0, self.map_size * self.zoom, self.map_size * self.zoom)
@@ -1082,6 +881,7 @@ class MapEditor:
         center_y = self.canvas.canvasy(canvas_height / 2)
         map_x = center_x / self.zoom
         map_y = center_y / self.zoom
+        self.zoom_index = self.zoom_levels.index(1.0)
         self.zoom = 1.0
         self.canvas.config(scrollregion=(0, 0, self.map_size, self.map_size))
         new_center_x = map_x * self.zoom
@@ -1098,80 +898,41 @@ class MapEditor:
             self.zoom_label.config(text="Zoom: 100%")
         self.needs_redraw = True
 
-    def get_zoomed_map_image(self):
-        """Return a zoomed PhotoImage for display."""
-        if self.map_image_zoomed is not None and self.map_image_zoom == self.zoom:
-            return self.map_image_zoomed
-        try:
-            from PIL import ImageTk, Image
-        except ImportError:
-            return self.map_image
-        if self.map_image is None:
-            return None
-        try:
-            pil_img = ImageTk.getimage(self.map_image)
-        except Exception:
-            return self.map_image
-        target_w = max(1, int(self.map_size * self.zoom))
-        target_h = max(1, int(self.map_size * self.zoom))
-        resized = pil_img.resize((target_w, target_h), resample=Image.NEAREST)
-        self.map_image_zoomed = ImageTk.PhotoImage(resized)
-        self.map_image_zoom = self.zoom
-        return self.map_image_zoomed
-
     def get_tile_texture_tk(self, tile_id):
         """Return tile texture PhotoImage for current zoom."""
         if tile_id not in self.tile_textures:
             return None
         if self.zoom == 1.0:
             return self.tile_textures_tk.get(tile_id)
+        # Zoom only takes values from self.zoom_levels, which bounds this cache
         key = (tile_id, self.zoom)
-        if key in self.tile_textures_zoomed:
-            return self.tile_textures_zoomed[key]
-        try:
-            from PIL import ImageTk, Image
-        except ImportError:
-            return self.tile_textures_tk.get(tile_id)
-        base = self.tile_textures[tile_id]
-        size = max(1, int(TILE_SIZE * self.zoom))
-        resized = base.resize((size, size), resample=Image.NEAREST)
-        tk_img = ImageTk.PhotoImage(resized)
-        self.tile_textures_zoomed[key] = tk_img
-        return tk_img
+        if key not in self.tile_textures_zoomed:
+            self.tile_textures_zoomed[key] = self.zoom_pyramid.tile_image(self.zoom, tile_id)
+        return self.tile_textures_zoomed[key]
 
     def begin_action(self):
         if self.current_action is None:
-            self.current_action = {}
-
-    def record_change(self, row, col, old_value):
-        if self.current_action is None:
-            self.current_action = {}
-        if (row, col) not in self.current_action:
-            self.current_action[(row, col)] = old_value
+            self.current_action = self.tiles.copy()
 
     def end_action(self):
-        if not self.current_action:
-            self.current_action = None
+        if self.current_action is None:
             return
-        changes = []
-        for (row, col), old_value in self.current_action.items():
-            new_value = self.tiles[row][col]
-            if old_value != new_value:
-                changes.append((row, col, old_value, new_value))
-        if changes:
+        # Undo entries are (rows, cols, old, new) arrays of the changed tiles
+        changes = diff_grids(self.current_action, self.tiles)
+        if len(changes[0]):
             self.undo_stack.append(changes)
             self.redo_stack.clear()
         self.current_action = None
 
     def apply_changes(self, changes, reverse=False):
-        for row, col, old_value, new_value in changes:
-            self.tiles[row][col] = old_value if reverse else new_value
-            self.dirty_tile_list.add((row, col))
+        rows, cols, old_values, new_values = changes
+        self.tiles[rows, cols] = old_values if reverse else new_values
+        self.dirty_tile_list.update(zip(rows.tolist(), cols.tolist()))
         self.image_cache_dirty = True
         self.needs_redraw = True
 
     def undo(self):
-        if self.current_action:
+        if self.current_action is not None:
             self.end_action()
         if not self.undo_stack:
             return
@@ -1180,7 +941,7 @@ class MapEditor:
         self.redo_stack.append(changes)
 
     def redo(self):
-        if self.current_action:
+        if self.current_action is not None:
             self.end_action()
         if not self.redo_stack:
             return
@@ -1214,15 +975,9 @@ class MapEditor:
         limit = self.spawn_limits.get(self.selected_tile)
         if limit is not None:
             current = self.count_tiles(self.selected_tile)
-            to_replace = 0
-            to_add = 0
-            for row in range(row1, row2 + 1):
-                for col in range(col1, col2 + 1):
-                    if 0 <= row < self.tile_count and 0 <= col < self.tile_count:
-                        if self.tiles[row][col] == self.selected_tile:
-                            to_replace += 1
-                        else:
-                            to_add += 1
+            area = clip_rect(self.tiles, row1, row2, col1, col2)[2]
+            to_replace = count_tile(area, self.selected_tile)
+            to_add = area.size - to_replace
             if current - to_replace + to_add > limit:
                 messagebox.showwarning(
                     "Limit Reached",
@@ -1230,32 +985,15 @@ class MapEditor:
                 )
                 return
 
-        # Fill area
+        # Fill area, tracking only the tiles that changed
         self.begin_action()
-        for row in range(row1, row2 + 1):
-            for col in range(col1, col2 + 1):
-                if 0 <= row < self.tile_count and 0 <= col < self.tile_count:
-                    if self.tiles[row][col] != self.selected_tile:
-                        self.record_change(row, col, self.tiles[row][col])
-                        self.tiles[row][col] = self.selected_tile
-        
-        # Track edited region
-        for row in range(row1, row2 + 1):
-            for col in range(col1, col2 + 1):
-                self.dirty_tile_list.add((row, col))
+        rows, cols = fill_rect(self.tiles, row1, row2, col1, col2, self.selected_tile)
+        self.dirty_tile_list.update(zip(rows.tolist(), cols.tolist()))
         self.end_action()
-        self.needs_redraw = True
-        
-        # Mark cache as dirty
-        self.image_cache_dirty = True
-        
-        # Redraw affected area (marks cache dirty)
-        for row in range(row1, row2 + 1):
-            for col in range(col1, col2 + 1):
-                self.draw_tile(row, col)
-        
-        # Update cache after editing
-        self.needs_redraw = True
+        if len(rows):
+            # Marks the cache dirty; the next draw_map() re-renders the region
+            self.draw_tile(int(rows[0]), int(cols[0]))
+            self.needs_redraw = True
         
         # Clear selection
         self.selection_start = None
@@ -1307,7 +1045,7 @@ class MapEditor:
                 "version": "1.0",
                 "mapSize": self.map_size,
                 "tileSize": TILE_SIZE,
-                "tiles": self.tiles
+                "tiles": grid_to_list(self.tiles)
             }
             
             with open(filename, 'w') as f:
@@ -1334,29 +1072,23 @@ class MapEditor:
             if "version" not in map_data or "mapSize" not in map_data or "tiles" not in map_data:
                 raise ValueError("Invalid map file format")
             
-            self.map_size = map_data["mapSize"]
-            if self.map_size % TILE_SIZE != 0:
+            map_size = map_data["mapSize"]
+            if map_size % TILE_SIZE != 0:
                 raise ValueError("mapSize in file must be divisible by TILE_SIZE")
-            self.tile_count = self.map_size // TILE_SIZE
-            self.tiles = map_data["tiles"]
+            # Validate tile values and dimensions before replacing the current map
+            tiles = grid_from_list(map_data["tiles"], map_size // TILE_SIZE)
+            self.map_size = map_size
+            self.tile_count = map_size // TILE_SIZE
+            self.tiles = tiles
             self.size_var.set(str(self.map_size))
             self.current_file = filename
             
-            # Validate tile values and dimensions
-            if len(self.tiles) != self.tile_count or any(len(row) != self.tile_count for row in self.tiles):
-                raise ValueError("Tile grid size does not match mapSize/tileSize")
-            for row in self.tiles:
-                for tile_id in row:
-                    if tile_id not in TILE_TYPES:
-                        raise ValueError(f"Invalid tile ID: {tile_id}")
-            
             # Reset editing center
             self.current_editing_center = None
             
             # Mark cache as dirty and regenerate
             self.image_cache_dirty = True
-            self.map_image = None
-            self.map_image_id = None
+            self.dirty_tile_list.clear()  # Edits to the old map; redraw everything
             self.edited_region = None  # Reset edited region for full regeneration
 
             self.update_map_image_cache()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Map Rendering for Tank Arena Map Editor
+
+Turns a tile grid into pixels with array operations instead of per-pixel
+Python loops. Tile IDs index a texture atlas holding one square image per
+tile ID; tiles without a texture get a flat square of their color from the
+color lookup table.
+"""
+
+import tkinter as tk
+
+import numpy as np
+
+from tile_definitions import TILE_SIZE, TILE_TYPES, get_tile_color
+
+try:
+    from PIL import Image, ImageTk
+except ImportError:
+    Image = ImageTk = None
+
+
+def hex_to_rgb(color_hex):
+    """Convert "#RRGGBB" to an (r, g, b) tuple"""
+    return tuple(int(color_hex[i:i + 2], 16) for i in (1, 3, 5))
+
+
+def build_color_lut():
+    """
+    Build the tile color lookup table
+
+    Returns:
+        (256, 4) uint8 RGBA array indexed by tile ID; unknown IDs are black
+    """
+    lut = np.zeros((256, 4), dtype=np.uint8)
+    for tile_id in range(256):
+        lut[tile_id, :3] = hex_to_rgb(get_tile_color(tile_id))
+    lut[:, 3] = 255
+    return lut
+
+
+COLOR_LUT = build_color_lut()
+
+
+def build_texture_atlas(textures):
+    """
+    Stack tile textures into one array indexed by tile ID
+
+    Args:
+        textures: Dict of tile ID -> RGBA PIL image of TILE_SIZE x TILE_SIZE
+
+    Returns:
+        (tile types, TILE_SIZE, TILE_SIZE, 4) uint8 array; tiles without a
+        texture are filled with their flat color
+    """
+    count = max(TILE_TYPES) + 1
+    atlas = np.empty((count, TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+    atlas[:] = COLOR_LUT[:count, None, None, :]
+    for tile_id, texture in textures.items():
+        atlas[tile_id] = np.asarray(texture.convert("RGBA"))
+    return atlas
+
+
+def scale_atlas(atlas, tile_px):
+    """
+    Resample every tile of an atlas to tile_px x tile_px
+
+    Shrinking averages each tile with a box filter (a mipmap level) when PIL
+    is available; enlarging repeats pixels, as PIL's NEAREST resize does.
+    """
+    size = atlas.shape[1]
+    if tile_px == size:
+        return atlas
+    if tile_px > size or Image is None:
+        index = ((np.arange(tile_px) + 0.5) * size / tile_px).astype(np.intp)
+        return np.ascontiguousarray(atlas[:, index[:, None], index])
+    return np.stack([
+        np.asarray(Image.fromarray(tile, "RGBA").resize((tile_px, tile_px), Image.BOX))
+        for tile in atlas
+    ])
+
+
+def render_atlas(tiles, atlas):
+    """
+    Render a tile grid (or a slice of one) from a texture atlas
+
+    Returns:
+        C-contiguous (rows * tile size, cols * tile size, 4) uint8 RGBA array
+    """
+    rows, cols = tiles.shape
+    size = atlas.shape[1]
+    # atlas[tiles] is (rows, cols, size, size, 4); interleave the tile and
+    # pixel axes so each tile's pixel rows land on consecutive image rows.
+    return atlas[tiles].transpose(0, 2, 1, 3, 4).reshape(rows * size, cols * size, 4)
+
+
+def image_from_pixels(pixels):
+    """Wrap a C-contiguous RGBA pixel array in a PIL image without copying it"""
+    h, w = pixels.shape[:2]
+    return Image.frombuffer("RGBA", (w, h), pixels, "raw", "RGBA", 0, 1)
+
+
+def photo_from_pixels(pixels):
+    """
+    Create a Tk PhotoImage from an RGBA pixel array
+
+    Uses PIL when available; otherwise hands Tk the RGB channels as binary
+    PPM data, dropping transparency.
+    """
+    if ImageTk is not None:
+        return ImageTk.PhotoImage(image_from_pixels(np.ascontiguousarray(pixels)))
+    h, w = pixels.shape[:2]
+    header = f"P6 {w} {h} 255\n".encode("ascii")
+    return tk.PhotoImage(data=header + pixels[..., :3].tobytes(), format="PPM")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tile Grid Operations for Tank Arena Map Editor
+
+The editor holds a map's tiles as a 2D uint8 NumPy array indexed [row, col].
+These helpers do whole-grid work (validation, counting, filling, diffing) as
+vectorized array operations. Map files still store nested lists, which are
+converted at load/save time.
+"""
+
+import numpy as np
+
+from tile_definitions import TILE_TYPES
+
+# Tile IDs are 0-7; one byte per tile keeps a 128x128 grid at 16 KB.
+TILE_DTYPE = np.uint8
+VALID_TILE_IDS = np.array(sorted(TILE_TYPES), dtype=TILE_DTYPE)
+
+
+def new_grid(tile_count, tile_id=0):
+    """Create a tile_count x tile_count grid filled with tile_id"""
+    return np.full((tile_count, tile_count), tile_id, dtype=TILE_DTYPE)
+
+
+def grid_from_list(rows, tile_count):
+    """
+    Convert the nested `tiles` list of a map file into a grid
+
+    Raises:
+        ValueError: If the grid is not tile_count x tile_count or holds an
+            unknown tile ID
+    """
+    try:
+        grid = np.array(rows)
+    except ValueError:
+        # Ragged rows cannot form a 2D array
+        grid = None
+    if grid is None or grid.shape != (tile_count, tile_count):
+        raise ValueError("Tile grid size does not match mapSize/tileSize")
+    if grid.dtype.kind not in "iu":
+        raise ValueError("Tile IDs must be integers")
+    invalid = ~np.isin(grid, VALID_TILE_IDS)
+    if invalid.any():
+        row, col = np.argwhere(invalid)[0]
+        raise ValueError(f"Invalid tile ID: {grid[row, col]}")
+    return grid.astype(TILE_DTYPE)
+
+
+def grid_to_list(grid):
+    """Convert a grid to nested lists of ints for JSON"""
+    return grid.tolist()
+
+
+def count_tile(grid, tile_id):
+    """Count the tiles of one type in a grid (or a slice of one)"""
+    return int(np.count_nonzero(grid == tile_id))
+
+
+def clip_rect(grid, row1, row2, col1, col2):
+    """
+    Clip an inclusive rectangle to the grid
+
+    Returns:
+        (row1, col1, area): the clipped top-left corner and a view of the
+        tiles inside, which is empty if the rectangle misses the grid
+    """
+    row1, col1 = max(row1, 0), max(col1, 0)
+    # Clamping below row1/col1 keeps negative ends from wrapping around
+    row2 = max(min(row2, grid.shape[0] - 1), row1 - 1)
+    col2 = max(min(col2, grid.shape[1] - 1), col1 - 1)
+    return row1, col1, grid[row1:row2 + 1, col1:col2 + 1]
+
+
+def fill_rect(grid, row1, row2, col1, col2, tile_id):
+    """
+    Set every tile in the inclusive rectangle to tile_id, clipped to the grid
+
+    Returns:
+        (rows, cols) arrays of the tiles that changed
+    """
+    row1, col1, area = clip_rect(grid, row1, row2, col1, col2)
+    rows, cols = np.nonzero(area != tile_id)
+    area[...] = tile_id
+    return rows + row1, cols + col1
+
+
+def diff_grids(before, after):
+    """
+    Compare two grids of the same shape
+
+    Returns:
+        (rows, cols, old, new) arrays for the tiles that differ
+    """
+    rows, cols = np.nonzero(before != after)
+    return rows, cols, before[rows, cols], after[rows, cols]
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Zoom Level Pyramid for Tank Arena Map Editor
+
+Zoom moves between discrete levels at which a tile is a whole number of
+display pixels. Each level keeps the texture atlas resampled to its tile size
+(box-filtered when shrinking, like a mipmap), and chunks at a level are
+composed straight from the tile grid and that atlas, so no level ever holds an
+image of the whole map and tile edges never fall between display pixels.
+"""
+
+import math
+
+from tile_definitions import TILE_SIZE
+from map_render import scale_atlas, render_atlas, photo_from_pixels
+from chunk_cache import CHUNK_SIZE, MAX_CHUNKS, ChunkCache
+
+# Ratio between neighbouring zoom levels, one Ctrl + wheel notch apart
+ZOOM_STEP = 1.1
+
+
+def zoom_levels(zoom_min, zoom_max, step=ZOOM_STEP):
+    """
+    Zoom factors from zoom_min to zoom_max, about `step` apart
+
+    Each factor makes a tile a whole number of display pixels, and 1.0 is
+    always included so the reset zoom is a level.
+    """
+    smallest = max(1, round(TILE_SIZE * zoom_min))
+    largest = max(smallest, round(TILE_SIZE * zoom_max))
+    sizes = {smallest, largest, TILE_SIZE}
+    size = smallest
+    # Stop short of a step that would land right next to largest
+    while size * math.sqrt(step) < largest:
+        sizes.add(round(size))
+        size *= step
+    return [size / TILE_SIZE for size in sorted(sizes) if smallest <= size <= largest]
+
+
+class ZoomPyramid:
+    """Per-zoom-level atlases and the chunk images rendered from them"""
+
+    def __init__(self, atlas, zooms, max_chunks=MAX_CHUNKS):
+        self.base_atlas = atlas
+        self.zooms = zooms
+        self.atlases = {}  # zoom -> atlas resampled to that level's tile size
+        self.chunks = ChunkCache(max_chunks)
+
+    def set_atlas(self, atlas):
+        """Replace the base atlas, dropping everything derived from it"""
+        self.base_atlas = atlas
+        self.atlases.clear()
+        self.chunks.clear()
+
+    def tile_px(self, zoom):
+        """Display size of one tile at a zoom level"""
+        return round(TILE_SIZE * zoom)
+
+    def level_atlas(self, zoom):
+        """The atlas at a zoom level, resampled on first use"""
+        atlas = self.atlases.get(zoom)
+        if atlas is None:
+            atlas = self.atlases[zoom] = scale_atlas(self.base_atlas, self.tile_px(zoom))
+        return atlas
+
+    def render_chunk(self, tiles, zoom, chunk_row, chunk_col):
+        """
+        Compose the pixels of one chunk from the tiles it overlaps
+
+        Returns:
+            (h, w, 4) uint8 RGBA array, at most CHUNK_SIZE on a side
+        """
+        atlas = self.level_atlas(zoom)
+        tile_px = atlas.shape[1]
+        display_size = tiles.shape[0] * tile_px
+        x1 = chunk_col * CHUNK_SIZE
+        y1 = chunk_row * CHUNK_SIZE
+        x2 = min(x1 + CHUNK_SIZE, display_size)
+        y2 = min(y1 + CHUNK_SIZE, display_size)
+        # Chunk edges need not fall on tile edges; render whole tiles and crop
+        row1, col1 = y1 // tile_px, x1 // tile_px
+        row2, col2 = math.ceil(y2 / tile_px), math.ceil(x2 / tile_px)
+        pixels = render_atlas(tiles[row1:row2, col1:col2], atlas)
+        top, left = y1 - row1 * tile_px, x1 - col1 * tile_px
+        return pixels[top:top + y2 - y1, left:left + x2 - x1]
+
+    def chunk(self, tiles, zoom, chunk_row, chunk_col):
+        """Image of one chunk at a zoom level, rendered on a cache miss"""
+        return self.chunks.get(
+            zoom, chunk_row, chunk_col,
+            lambda: photo_from_pixels(self.render_chunk(tiles, zoom, chunk_row, chunk_col))
+        )
+
+    def prefetch(self, tiles, zoom, chunk_row, chunk_col):
+        """Render a chunk ahead of need; False once the cache is full"""
+        return self.chunks.prefetch(
+            zoom, chunk_row, chunk_col,
+            lambda: photo_from_pixels(self.render_chunk(tiles, zoom, chunk_row, chunk_col))
+        )
+
+    def tile_image(self, zoom, tile_id):
+        """Image of a single tile at a zoom level"""
+        return photo_from_pixels(self.level_atlas(zoom)[tile_id])
+
+    def invalidate_tiles(self, min_row, max_row, min_col, max_col):
+        """Drop the chunks showing an inclusive range of tiles at every level"""
+        self.chunks.invalidate(
+            min_col * TILE_SIZE, min_row * TILE_SIZE,
+            (max_col + 1) * TILE_SIZE, (max_row + 1) * TILE_SIZE
+        )
+
+    def clear(self):
+        """Drop every chunk, e.g. after a new map is loaded"""
+        self.chunks.clear()